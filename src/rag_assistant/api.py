@@ -1,46 +1,432 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Literal
 
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+
+from .cache import LRUCache
+from .concurrency import AdmissionControl, MicroBatcher, run_in
 from .config import settings
+from .embeddings import embed_queries
+from .llm import LLMError, build_messages, get_provider
+from .manifest import IndexGeneration
+from .packing import CHUNK_SEPARATOR, estimate_tokens, pack_context
+from .rerank import get_reranker, reranker_stats
+from .retriever import BM25Holder, candidate_count, fuse, mmr_search, normalize_question, query_cache, registry
+from .semantic_cache import SemanticCache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm the shared retriever in the background at startup: /healthz answers
+    as soon as the server binds, /readyz only once the warm-up has finished.
+    """
+    threading.Thread(target=registry.warmup, name="warmup", daemon=True).start()
+    if settings.RERANK_MODEL:
+        threading.Thread(target=get_reranker, name="rerank-warmup", daemon=True).start()
+    yield
+    if llm is not None:
+        await llm.aclose()
+
+
+app = FastAPI(title="RAG Assistant API", version="0.1.0", lifespan=lifespan)
+
+index_generation = IndexGeneration(settings.CHROMA_DIR)
+answer_cache = LRUCache(settings.ANSWER_CACHE_SIZE)
+semantic_cache = SemanticCache(settings.SEMANTIC_CACHE_SIZE, settings.SEMANTIC_CACHE_DISTANCE)
+bm25 = BM25Holder(settings.CHROMA_DIR)
+
+# Dedicated pools so CPU-heavy encoding and Chroma searches neither starve nor
+# are starved by Starlette's shared threadpool; admission caps what may queue.
+embed_pool = ThreadPoolExecutor(settings.EMBED_WORKERS, thread_name_prefix="embed")
+search_pool = ThreadPoolExecutor(settings.SEARCH_WORKERS, thread_name_prefix="search")
+admission = AdmissionControl(settings.MAX_INFLIGHT_ASKS)
 
-app = FastAPI(title="RAG Assistant API", version="0.1.0")
+# Generation backend from LLM_PROVIDER; None keeps the extractive answer.
+llm = get_provider()
+
+
+def _embed_batch(questions: list[str]) -> list[list[float]]:
+    """One forward pass for a micro-batch of normalized questions (duplicates encoded once)."""
+    unique = list(dict.fromkeys(questions))
+    vectors = dict(zip(unique, embed_queries(_retriever().embeddings, unique)))
+    return [vectors[q] for q in questions]
+
+
+query_batcher = MicroBatcher(
+    _embed_batch,
+    embed_pool,
+    max_batch=settings.QUERY_BATCH_MAX_SIZE,
+    max_wait=settings.QUERY_BATCH_MAX_WAIT_MS / 1000,
+)
 
 class AskRequest(BaseModel):
     """Incoming request schema for /ask."""
+    model_config = ConfigDict(populate_by_name=True)
+
     question: str
     k: int = 4
     max_chars: int = 1500
+    # "hybrid" fuses BM25 and vector rankings (RRF), "mmr" diversifies the
+    # fetch_k nearest chunks; None uses RETRIEVAL_MODE.
+    mode: Literal["vector", "hybrid", "mmr"] | None = None
+    vector_weight: float = 1.0
+    bm25_weight: float = 1.0
+    fetch_k: int = settings.MMR_FETCH_K
+    lambda_mult: float = Field(settings.MMR_LAMBDA, alias="lambda", ge=0.0, le=1.0)
+    # Cross-encoder rerank of over-fetched candidates; None = on when RERANK_MODEL is set.
+    rerank: bool | None = None
 
 class AskResponse(BaseModel):
     """Outgoing response schema for /ask."""
     answer: str
     sources: list[str]
 
+class AskBatchRequest(BaseModel):
+    """Incoming request schema for /ask/batch."""
+    items: list[AskRequest]
+    stream: bool = False
+
+class AskBatchItem(BaseModel):
+    """One /ask/batch result; `error` is set instead of answer/sources when the item failed."""
+    index: int
+    answer: str | None = None
+    sources: list[str] = []
+    error: str | None = None
+
+class AskBatchResponse(BaseModel):
+    """Outgoing response schema for /ask/batch (results in request order)."""
+    results: list[AskBatchItem]
+
 def _retriever():
-    """Build a retriever backed by Chroma (persisted in ./storage)."""
-    embeddings = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
-    return Chroma(embedding_function=embeddings, persist_directory=settings.CHROMA_DIR)
+    """Return the process-wide vector store (VECTOR_BACKEND, persisted in ./storage)."""
+    return registry.get()
+
+NO_RESULTS = "No results found. Did you run ingestion?"
+
+def _sources(docs) -> list[str]:
+    return sorted({d.metadata.get("source", "") for d in docs if d.metadata.get("source")})
+
+def _pack(req: AskRequest, docs) -> list:
+    """
+    Dedup overlapping chunks and keep the best sentences: within max_chars for
+    the extractive answer, within CONTEXT_TOKEN_BUDGET for the LLM prompt.
+    """
+    if llm is None:
+        return pack_context(docs, req.max_chars, req.question)
+    return pack_context(docs, settings.CONTEXT_TOKEN_BUDGET, req.question, length=estimate_tokens)
+
+def _extractive_fragments(docs, max_chars: int):
+    """Yield the stitched (packed) chunks piece by piece, never beyond max_chars."""
+    if not docs:
+        yield NO_RESULTS
+        return
+    budget = max_chars
+    for i, d in enumerate(docs):
+        piece = (CHUNK_SEPARATOR if i else "") + d.page_content
+        if budget <= 0:
+            return
+        yield piece[:budget]
+        budget -= len(piece)
+
+def _build_response(docs, max_chars: int) -> AskResponse:
+    """Stitch a concise extractive answer and unique sources from retrieved chunks."""
+    return AskResponse(answer="".join(_extractive_fragments(docs, max_chars)), sources=_sources(docs))
+
+def _max_tokens(max_chars: int) -> int:
+    # ~4 characters per token for English text.
+    return max(16, max_chars // 4)
+
+async def _generate(req: AskRequest, docs) -> AskResponse:
+    """LLM answer grounded in `docs` when a provider is configured, else extractive."""
+    if llm is None or not docs:
+        return _build_response(docs, req.max_chars)
+    try:
+        answer = await llm.generate(build_messages(req.question, docs), _max_tokens(req.max_chars))
+    except LLMError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return AskResponse(answer=answer, sources=_sources(docs))
+
+async def _fragments(req: AskRequest, docs):
+    """Answer fragments as they are produced (LLM deltas or extractive chunks)."""
+    if llm is None or not docs:
+        for fragment in _extractive_fragments(docs, req.max_chars):
+            yield fragment
+        return
+    async for delta in llm.stream(build_messages(req.question, docs), _max_tokens(req.max_chars)):
+        yield delta
+
+async def _embed_question(question: str) -> list[float]:
+    """Query embedding from the LRU, or from a micro-batched forward pass on a miss."""
+    key = normalize_question(question)
+    vector = query_cache.get(key)
+    if vector is None:
+        vector = await query_batcher.submit(key)
+        query_cache.put(key, vector)
+    return vector
+
+def _reranks(req: AskRequest) -> bool:
+    return bool(settings.RERANK_MODEL) and req.rerank is not False
+
+def _params(req: AskRequest) -> tuple:
+    """Everything but the question that changes the answer (part of every cache key)."""
+    params = req.model_dump(exclude={"question"})
+    params["mode"] = req.mode or settings.RETRIEVAL_MODE
+    params["rerank"] = _reranks(req)
+    return tuple(sorted(params.items()))
+
+def _lookup(req: AskRequest):
+    """Answer-cache key, index generation and cached response (or None) for a request."""
+    generation = index_generation.current()
+    key = (normalize_question(req.question), _params(req), generation)
+    return key, generation, answer_cache.get(key)
+
+async def _store(generation: int):
+    """The store for `generation`; building or reopening it happens off the event loop."""
+    if registry.stale(generation):
+        return await run_in(embed_pool, registry.get, generation)
+    return registry.get(generation)
+
+async def _candidates(req: AskRequest, vector, generation: int, k: int) -> list:
+    """
+    Vector top-k; in hybrid mode dense and BM25 candidates searched
+    concurrently and fused; in mmr mode the fetch_k nearest, diversified.
+    """
+    vs = await _store(generation)
+    mode = req.mode or settings.RETRIEVAL_MODE
+    if mode == "mmr":
+        return await run_in(search_pool, mmr_search, vs, vector, k, req.fetch_k, req.lambda_mult)
+    if mode != "hybrid":
+        return await run_in(search_pool, lambda: vs.similarity_search_by_vector(vector, k=k))
+    fetch = candidate_count(k)
+    # bm25.get may (re)load the index from disk: keep that off the event loop.
+    dense, sparse = await asyncio.gather(
+        run_in(search_pool, lambda: vs.similarity_search_by_vector(vector, k=fetch)),
+        run_in(search_pool, lambda: bm25.get(generation).search(req.question, fetch)),
+    )
+    weights = (req.vector_weight, req.bm25_weight)
+    return await run_in(search_pool, fuse, vs, dense, sparse, k, weights)
+
+async def _search(req: AskRequest, vector, generation: int, started: float) -> list:
+    """
+    Top-k chunks. With reranking, RERANK_CANDIDATES are fetched and rescored
+    on the embed pool unless that would end past RERANK_DEADLINE_MS. In mmr
+    mode MMR still picks the final k (from at least RERANK_CANDIDATES
+    nearest) and the cross-encoder only orders them, so near-duplicates
+    stay dropped.
+    """
+    if not _reranks(req):
+        return await _candidates(req, vector, generation, req.k)
+    if (req.mode or settings.RETRIEVAL_MODE) == "mmr":
+        wide = req.model_copy(update={"fetch_k": max(req.fetch_k, settings.RERANK_CANDIDATES)})
+        docs = await _candidates(wide, vector, generation, req.k)
+    else:
+        docs = await _candidates(req, vector, generation, max(req.k, settings.RERANK_CANDIDATES))
+    deadline = started + settings.RERANK_DEADLINE_MS / 1000
+    return await run_in(embed_pool, lambda: get_reranker().rerank(req.question, docs, req.k, deadline))
+
+async def _retrieve(req: AskRequest, key, generation: int, vector, started: float) -> AskResponse:
+    """Semantic-cache check, then Chroma search on the search pool; caches the result."""
+    scope = (_params(req), generation)
+    similar = semantic_cache.get(vector, scope)
+    if similar is not None:
+        answer_cache.put(key, similar)
+        return similar
+
+    docs = _pack(req, await _search(req, vector, generation, started))
+    resp = await _generate(req, docs)
+    answer_cache.put(key, resp)
+    semantic_cache.put(vector, scope, resp)
+    return resp
+
+async def _answer(req: AskRequest) -> AskResponse:
+    started = time.monotonic()
+    key, generation, cached = _lookup(req)
+    if cached is not None:
+        return cached
+    vector = await _embed_question(req.question)
+    return await _retrieve(req, key, generation, vector, started)
+
+def _busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="Server busy, retry shortly.", headers={"Retry-After": "1"})
 
 @app.post("/ask", response_model=AskResponse)
-def ask(req: AskRequest):
+async def ask(req: AskRequest):
     """
     Take a question, fetch top-k chunks, stitch a concise extractive answer,
-    and return answer + unique sources.
+    and return answer + unique sources. Answers are cached per index generation,
+    both for exact (normalized) repeats and for paraphrases whose embedding is
+    close to an already answered question. Embedding and search run on their
+    own executors; beyond MAX_INFLIGHT_ASKS concurrent requests we answer 503.
     """
-    vs = _retriever()
-    docs = vs.similarity_search(req.question, k=req.k)
+    if not admission.try_acquire():
+        raise _busy()
+    try:
+        return await _answer(req)
+    finally:
+        admission.release()
 
-    if not docs:
-        return AskResponse(answer="No results found. Did you run ingestion?", sources=[])
+async def _embed_many(questions: list[str]) -> dict:
+    """Normalized question -> vector, encoding all LRU misses in a single batch."""
+    vectors = {}
+    for key in dict.fromkeys(normalize_question(q) for q in questions):
+        vectors[key] = query_cache.get(key)
+    missing = [key for key, v in vectors.items() if v is None]
+    if missing:
+        for key, vector in zip(missing, await run_in(embed_pool, _embed_batch, missing)):
+            query_cache.put(key, vector)
+            vectors[key] = vector
+    return vectors
+
+def _batch_tasks(items: list[AskRequest]) -> list:
+    """One task per item; each resolves to an AskBatchItem and never raises."""
+    started = time.monotonic()
+    lookups = [_lookup(item) for item in items]
+    pending = [item.question for item, (_, _, cached) in zip(items, lookups) if cached is None]
+    vectors_task = asyncio.ensure_future(_embed_many(pending))
+
+    async def one(index: int) -> AskBatchItem:
+        item = items[index]
+        key, generation, cached = lookups[index]
+        try:
+            if cached is None:
+                vectors = await vectors_task
+                cached = await _retrieve(item, key, generation, vectors[normalize_question(item.question)], started)
+            return AskBatchItem(index=index, answer=cached.answer, sources=cached.sources)
+        except Exception as e:
+            return AskBatchItem(index=index, error=f"{type(e).__name__}: {e}")
+
+    return [asyncio.ensure_future(one(i)) for i in range(len(items))]
+
+class _AdmittedStream(StreamingResponse):
+    """
+    StreamingResponse that runs `on_close` (releasing the admission slot)
+    however the response ends. The body generator's own `finally` is not
+    enough: Starlette never starts it if the client is gone before the
+    response start is sent.
+    """
+
+    def __init__(self, content, on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
 
-    stitched = "\n---\n".join(d.page_content for d in docs)
-    answer = stitched[:req.max_chars]
-    sources = sorted({d.metadata.get("source", "") for d in docs if d.metadata.get("source")})
-    return AskResponse(answer=answer, sources=sources)
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+@app.post("/ask/batch", response_model=AskBatchResponse)
+async def ask_batch(req: AskBatchRequest):
+    """
+    Answer many questions in one round trip. All uncached questions are
+    embedded in one batch and their searches run concurrently; results come
+    back in request order with per-item errors. With `stream: true` items are
+    sent as NDJSON lines (each tagged with its index) as soon as they finish.
+    """
+    if len(req.items) > settings.MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.MAX_BATCH_ITEMS} items per batch.")
+    if not admission.try_acquire():
+        raise _busy()
+    tasks = _batch_tasks(req.items)
+
+    if not req.stream:
+        try:
+            return AskBatchResponse(results=await asyncio.gather(*tasks))
+        finally:
+            admission.release()
+
+    async def lines():
+        for done in asyncio.as_completed(tasks):
+            item = await done
+            yield item.model_dump_json() + "\n"
+
+    def close():
+        for t in tasks:
+            t.cancel()
+        admission.release()
+
+    return _AdmittedStream(lines(), close, media_type="application/x-ndjson")
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    """
+    Server-Sent Events variant of /ask: a `sources` event as soon as retrieval
+    is done, then `answer` events carrying answer fragments as they are
+    produced, then `done`. Failures after the stream started arrive as `error`.
+    """
+    if not admission.try_acquire():
+        raise _busy()
+
+    async def events():
+        try:
+            started = time.monotonic()
+            key, generation, cached = _lookup(req)
+            if cached is None:
+                vector = await _embed_question(req.question)
+                scope = (_params(req), generation)
+                cached = semantic_cache.get(vector, scope)
+                if cached is not None:
+                    answer_cache.put(key, cached)  # as _retrieve does
+            if cached is not None:
+                yield _sse("sources", cached.sources)
+                yield _sse("answer", cached.answer)
+                yield _sse("done", {})
+                return
+
+            docs = _pack(req, await _search(req, vector, generation, started))
+            sources = _sources(docs)
+            yield _sse("sources", sources)
+            fragments = []
+            async for fragment in _fragments(req, docs):
+                fragments.append(fragment)
+                yield _sse("answer", fragment)
+            yield _sse("done", {})
+
+            resp = AskResponse(answer="".join(fragments), sources=sources)
+            answer_cache.put(key, resp)
+            semantic_cache.put(vector, scope, resp)
+        except Exception as e:
+            yield _sse("error", {"detail": f"{type(e).__name__}: {e}"})
+
+    return _AdmittedStream(
+        events(), admission.release, media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
 
 @app.get("/healthz")
 def healthz():
     """Lightweight health check for uptime probes and quick diagnostics."""
     return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness probe: 200 only once the model, store and search path are warm."""
+    ready, components = registry.status()
+    if ready:
+        return {"status": "ready", "components": components}
+    failed = any(not c["ready"] for c in components.values())
+    status = "failed" if failed else "warming"
+    return JSONResponse({"status": status, "components": components}, status_code=503)
+
+@app.get("/stats")
+def stats():
+    """Cache hit rates for this worker process."""
+    return {
+        "index_generation": index_generation.current(),
+        "query_cache": query_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "admission": admission.stats(),
+        "query_batching": query_batcher.stats(),
+        "rerank": reranker_stats(),
+    }
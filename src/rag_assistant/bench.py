@@ -0,0 +1,248 @@
+# src/rag_assistant/bench.py
+
+"""
+Micro-benchmarks for retrieval internals (mmr, quant and split need no model or index).
+
+    python -m rag_assistant.bench mmr [--candidates 20] [--k 4] [--dim 384]
+    python -m rag_assistant.bench quant [--rows 100000] [--dim 384] [--k 10]
+    python -m rag_assistant.bench embed [--model NAME] [--texts 256]
+    python -m rag_assistant.bench split [--docs 200] [--chars 20000]
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from .config import settings
+from .numpy_store import NumpyStore
+from .quantize import MODES
+from .retriever import mmr_select
+from .splitter import OffsetTextSplitter, boundary_drift
+
+
+def _timed(fn: Callable, repeat: int) -> float:
+    """Mean milliseconds per call."""
+    fn()  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def _clustered_candidates(rng, n: int, dim: int, docs: int):
+    """
+    Candidates drawn as near-duplicates around `docs` centers, like overlapping
+    chunks of a few documents; the query is closest to the first center.
+    """
+    centers = rng.standard_normal((docs, dim)).astype(np.float32)
+    labels = np.arange(n) % docs
+    X = centers[labels] + 0.15 * rng.standard_normal((n, dim)).astype(np.float32)
+    query = centers[0] + 0.5 * centers[1:].mean(axis=0)
+    return query, X, labels
+
+
+def _redundancy(X, picked: List[int]) -> float:
+    """Mean cosine similarity between the picked candidates (lower = more diverse)."""
+    if len(picked) < 2:
+        return 0.0
+    V = X[picked] / np.linalg.norm(X[picked], axis=1, keepdims=True)
+    sims = V @ V.T
+    return float(sims[~np.eye(len(picked), dtype=bool)].mean())
+
+
+def bench_mmr(candidates: int, k: int, dim: int, docs: int, lambda_mult: float, repeat: int) -> dict:
+    rng = np.random.default_rng(0)
+    query, X, labels = _clustered_candidates(rng, candidates, dim, docs)
+    qn = query / np.linalg.norm(query)
+    Xn = X / np.linalg.norm(X, axis=1, keepdims=True)
+
+    def top_k():
+        rel = Xn @ qn
+        idx = np.argpartition(-rel, k - 1)[:k]
+        return list(idx[np.argsort(-rel[idx])])
+
+    def mmr():
+        return mmr_select(query, X, k, lambda_mult)
+
+    results = {}
+    for name, fn in (("top_k", top_k), ("mmr", mmr)):
+        picked = [int(i) for i in fn()]
+        results[name] = {
+            "ms_per_query": round(_timed(fn, repeat), 4),
+            "distinct_docs": len({int(labels[i]) for i in picked}),
+            "mean_pairwise_similarity": round(_redundancy(X, picked), 4),
+        }
+    try:
+        from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+        def reference():
+            return maximal_marginal_relevance(query, X, lambda_mult=lambda_mult, k=k)
+
+        results["mmr_langchain"] = {"ms_per_query": round(_timed(reference, repeat), 4)}
+    except ImportError:
+        pass
+    return {
+        "candidates": candidates, "k": k, "dim": dim, "docs": docs, "lambda": lambda_mult,
+        "results": results,
+    }
+
+
+def bench_quant(rows: int, dim: int, k: int, queries: int, rescore_factor: int) -> dict:
+    """Memory, latency and recall@k of each numpy-store quantization mode vs exact float32."""
+    rng = np.random.default_rng(0)
+    # Topic-clustered unit vectors, closer to sentence embeddings than pure noise.
+    centers = rng.standard_normal((max(1, rows // 200), dim)).astype(np.float32)
+    X = centers[rng.integers(0, len(centers), rows)] + 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+    picks = rng.integers(0, rows, size=(queries, 2))
+    Q = (X[picks[:, 0]] + X[picks[:, 1]]) / 2
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            store = NumpyStore(f"{tmp}/{mode}", quantization=mode, rescore_factor=rescore_factor)
+            store.upsert([str(i) for i in range(rows)], X, [""] * rows, [{}] * rows)
+            store.persist()
+            snap = store._current()
+            found = 0
+            for q in Q:
+                truth = set(store._top_rows(snap, q, k, exact=True).tolist())
+                found += len(truth & set(store._top_rows(snap, q, k).tolist()))
+            mem = store.memory()
+            results[mode] = {
+                "index_mib": round(mem["index_bytes"] / 2**20, 2),
+                "saved_ratio": mem["saved_ratio"],
+                "recall_at_k": round(found / (queries * k), 4),
+                "ms_per_query": round(_timed(lambda: store._top_rows(snap, Q[0], k), 20), 3),
+            }
+            del snap
+    return {"rows": rows, "dim": dim, "k": k, "rescore_factor": rescore_factor, "results": results}
+
+
+def bench_embed(model_name: str, texts: int, batch_size: int, cache_dir: str) -> dict:
+    """Chunk-embedding throughput: PyTorch sentence-transformers vs ONNX Runtime fp32/int8."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    from .onnx_embeddings import OnnxEmbeddings
+
+    sample = [f"{i} " + "Chunks of documentation about ingestion, retrieval and answers. " * 12 for i in range(texts)]
+    backends = {"torch": lambda: HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"batch_size": batch_size})}
+    for name, quantize in (("onnx_fp32", False), ("onnx_int8", True)):
+        backends[name] = lambda q=quantize: OnnxEmbeddings(model_name, cache_dir, quantize=q, batch_size=batch_size)
+
+    results, reference = {}, None
+    for name, build in backends.items():
+        started = time.perf_counter()
+        emb = build()
+        load = time.perf_counter() - started
+        emb.embed_documents(sample[:batch_size])  # warm-up
+        started = time.perf_counter()
+        vectors = np.asarray(emb.embed_documents(sample), dtype=np.float32)
+        seconds = time.perf_counter() - started
+        if reference is None:
+            reference = vectors
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+        results[name] = {
+            "load_seconds": round(load, 2),
+            "texts_per_second": round(texts / seconds, 1),
+            "min_cosine_vs_torch": round(float(((vectors * reference).sum(axis=1) / norms).min()), 5),
+        }
+        if name != "torch":
+            results[name]["threads"] = emb.threads
+    return {"model": model_name, "texts": texts, "batch_size": batch_size, "results": results}
+
+
+def _synthetic_docs(rng, docs: int, chars: int) -> List[str]:
+    """Markdown-ish documents: paragraphs, short lines, long unbroken lines (URLs, code)."""
+    words = "the index chunk query error code retrieval answer ingest model of to and a".split()
+    out = []
+    for _ in range(docs):
+        parts, size = [], 0
+        while size < chars:
+            r = rng.random()
+            if r < 0.1:
+                part = "\n\n"
+            elif r < 0.2:
+                part = "\n"
+            elif r < 0.22:
+                part = "https://example.com/" + "x" * int(rng.integers(50, 1500)) + " "
+            else:
+                part = " ".join(rng.choice(words, int(rng.integers(3, 15)))) + ". "
+            parts.append(part)
+            size += len(part)
+        out.append("".join(parts))
+    return out
+
+
+def bench_split(docs: int, chars: int, chunk_size: int, chunk_overlap: int, repeat: int) -> dict:
+    """OffsetTextSplitter vs RecursiveCharacterTextSplitter: speed and boundary agreement."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    texts = _synthetic_docs(np.random.default_rng(0), docs, chars)
+    reference = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    offsets = OffsetTextSplitter(chunk_size, chunk_overlap)
+    expected = [reference.split_text(t) for t in texts]
+    spans = [offsets.split_spans(t) for t in texts]
+    drifts = [boundary_drift(e, t, s) for e, t, s in zip(expected, texts, spans)]
+    results = {}
+    for name, fn in (("recursive_character", reference.split_text), ("offset", offsets.split_text)):
+        seconds = _timed(lambda: [fn(t) for t in texts], repeat) / 1000
+        results[name] = {"mb_per_second": round(docs * chars / seconds / 1e6, 2)}
+    results["offset"]["speedup"] = round(
+        results["offset"]["mb_per_second"] / results["recursive_character"]["mb_per_second"], 2
+    )
+    return {
+        "docs": docs, "chars": chars, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap,
+        "chunks": sum(len(s) for s in spans),
+        "docs_with_other_chunk_count": sum(d is None for d in drifts),
+        "max_boundary_drift_chars": max((d for d in drifts if d is not None), default=0),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="bench", required=True)
+    mmr = sub.add_parser("mmr", help="MMR vs plain top-k: latency and diversity")
+    mmr.add_argument("--candidates", type=int, default=20)
+    mmr.add_argument("--k", type=int, default=4)
+    mmr.add_argument("--dim", type=int, default=384)
+    mmr.add_argument("--docs", type=int, default=5, help="documents the candidates are chunks of")
+    mmr.add_argument("--lambda", dest="lambda_mult", type=float, default=0.5)
+    mmr.add_argument("--repeat", type=int, default=500)
+    quant = sub.add_parser("quant", help="numpy-store quantization: memory saved vs recall lost")
+    quant.add_argument("--rows", type=int, default=100000)
+    quant.add_argument("--dim", type=int, default=384)
+    quant.add_argument("--k", type=int, default=10)
+    quant.add_argument("--queries", type=int, default=50)
+    quant.add_argument("--rescore-factor", type=int, default=10)
+    embed = sub.add_parser("embed", help="embedding throughput: PyTorch vs ONNX Runtime")
+    embed.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    embed.add_argument("--texts", type=int, default=256)
+    embed.add_argument("--batch-size", type=int, default=32)
+    embed.add_argument("--cache-dir", default=settings.ONNX_CACHE_DIR)
+    split = sub.add_parser("split", help="offset splitter vs RecursiveCharacterTextSplitter")
+    split.add_argument("--docs", type=int, default=200)
+    split.add_argument("--chars", type=int, default=20000)
+    split.add_argument("--chunk-size", type=int, default=1000)
+    split.add_argument("--chunk-overlap", type=int, default=200)
+    split.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.bench == "mmr":
+        report = bench_mmr(args.candidates, args.k, args.dim, args.docs, args.lambda_mult, args.repeat)
+    elif args.bench == "quant":
+        report = bench_quant(args.rows, args.dim, args.k, args.queries, args.rescore_factor)
+    elif args.bench == "embed":
+        report = bench_embed(args.model, args.texts, args.batch_size, args.cache_dir)
+    elif args.bench == "split":
+        report = bench_split(args.docs, args.chars, args.chunk_size, args.chunk_overlap, args.repeat)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# src/rag_assistant/bm25.py
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+BM25_NAME = "bm25.npz"
+
+# Identifier-friendly tokens: "ERR_CONN_RESET", "E42", "0x80070005", "v1.2.3" and
+# "foo-bar" stay whole (and also contribute their parts), so pasted codes match.
+_TOKEN = re.compile(r"\w[\w.\-:/]*\w|\w")
+_PARTS = re.compile(r"[.\-:/_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for tok in _TOKEN.findall((text or "").casefold()):
+        tokens.append(tok)
+        parts = [p for p in _PARTS.split(tok) if p]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def _blob(strings: Sequence[str]) -> np.ndarray:
+    return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+
+
+def _unblob(arr: np.ndarray) -> List[str]:
+    text = arr.tobytes().decode("utf-8")
+    return text.split("\n") if text else []
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over chunk ids, persisted next to the Chroma data.
+
+    Postings are stored CSR-style: per term a contiguous slice of uint32 doc
+    numbers and uint16 term frequencies (`indptr` gives the slice bounds).
+    Updates are buffered and merged with vectorized NumPy ops on `save()` or
+    the next search. `upsert` replaces a chunk with the same id, mirroring
+    Chroma, so re-ingesting a file never double counts it.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.doc_len = np.zeros(0, dtype=np.uint32)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.postings = np.zeros(0, dtype=np.uint32)
+        self.tfs = np.zeros(0, dtype=np.uint16)
+        self._dead: set = set()
+        self._new: List[Tuple[str, Dict[str, int]]] = []
+
+    def __len__(self) -> int:
+        self._compact()
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, chroma_dir: str) -> "BM25Index":
+        index = cls()
+        path = Path(chroma_dir) / BM25_NAME
+        if not path.exists():
+            return index
+        with np.load(path) as z:
+            index.vocab = {t: i for i, t in enumerate(_unblob(z["terms"]))}
+            index.ids = _unblob(z["ids"])
+            index.doc_len = z["doc_len"]
+            index.indptr = z["indptr"]
+            index.postings = z["postings"]
+            index.tfs = z["tfs"]
+        return index
+
+    def save(self, chroma_dir: str) -> None:
+        self._compact()
+        path = Path(chroma_dir) / BM25_NAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        terms = sorted(self.vocab, key=self.vocab.get)
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez(
+            tmp,
+            terms=_blob(terms),
+            ids=_blob(self.ids),
+            doc_len=self.doc_len,
+            indptr=self.indptr,
+            postings=self.postings,
+            tfs=self.tfs,
+        )
+        os.replace(tmp, path)
+
+    def upsert(self, ids: Iterable[str], texts: Iterable[str]) -> None:
+        for cid, text in zip(ids, texts):
+            counts: Dict[str, int] = {}
+            for tok in tokenize(text):
+                counts[tok] = counts.get(tok, 0) + 1
+            self._dead.add(cid)
+            self._new.append((cid, counts))
+
+    def remove(self, ids: Iterable[str]) -> None:
+        ids = set(ids)
+        self._dead |= ids
+        self._new = [(cid, c) for cid, c in self._new if cid not in ids]
+
+    def _compact(self) -> None:
+        """Apply buffered removals/additions and rebuild the CSR arrays."""
+        if not self._dead and not self._new:
+            return
+        # Existing postings as COO (term, doc, tf), minus removed docs.
+        n_terms = len(self.indptr) - 1
+        terms = np.repeat(np.arange(n_terms, dtype=np.uint32), np.diff(self.indptr))
+        keep = np.array([cid not in self._dead for cid in self.ids], dtype=bool)
+        remap = np.cumsum(keep, dtype=np.int64) - 1
+        alive = keep[self.postings] if len(self.postings) else np.zeros(0, dtype=bool)
+        terms, docs, tfs = terms[alive], remap[self.postings[alive]], self.tfs[alive]
+        ids = [cid for cid, k in zip(self.ids, keep) if k]
+        doc_len = list(self.doc_len[keep])
+
+        # New (or replaced) docs; later upserts of the same id win.
+        latest = {cid: counts for cid, counts in self._new}
+        new_terms, new_docs, new_tfs = [], [], []
+        for cid, counts in latest.items():
+            doc = len(ids)
+            ids.append(cid)
+            doc_len.append(sum(counts.values()))
+            for tok, tf in counts.items():
+                new_terms.append(self.vocab.setdefault(tok, len(self.vocab)))
+                new_docs.append(doc)
+                new_tfs.append(min(tf, 65535))
+        terms = np.concatenate([terms, np.asarray(new_terms, dtype=np.uint32)])
+        docs = np.concatenate([docs, np.asarray(new_docs, dtype=np.int64)])
+        tfs = np.concatenate([tfs, np.asarray(new_tfs, dtype=np.uint16)])
+
+        # Drop terms that lost all their postings, then sort into CSR order.
+        used = np.zeros(len(self.vocab), dtype=bool)
+        used[terms] = True
+        term_remap = np.cumsum(used, dtype=np.int64) - 1
+        self.vocab = {t: int(term_remap[i]) for t, i in self.vocab.items() if used[i]}
+        terms = term_remap[terms]
+        order = np.lexsort((docs, terms))
+        self.postings = docs[order].astype(np.uint32)
+        self.tfs = tfs[order]
+        self.indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocab)), out=self.indptr[1:])
+        self.ids = ids
+        self.doc_len = np.asarray(doc_len, dtype=np.uint32)
+        self._dead = set()
+        self._new = []
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[str, float]]:
+        """Top-k (chunk id, BM25 score) for `query`."""
+        self._compact()
+        n = len(self.ids)
+        if n == 0 or k <= 0:
+            return []
+        avg_len = float(self.doc_len.mean()) or 1.0
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / avg_len)
+        scores = np.zeros(n, dtype=np.float32)
+        for tok in set(tokenize(query)):
+            t = self.vocab.get(tok)
+            if t is None:
+                continue
+            lo, hi = self.indptr[t], self.indptr[t + 1]
+            docs, tf = self.postings[lo:hi], self.tfs[lo:hi].astype(np.float32)
+            idf = np.log(1 + (n - (hi - lo) + 0.5) / ((hi - lo) + 0.5))
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm[docs])
+        hits = np.flatnonzero(scores)
+        if len(hits) == 0:
+            return []
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self.ids[i], float(scores[i])) for i in hits]
+
+
+def rrf_fuse(rankings: Sequence[Sequence[str]], weights: Sequence[float], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Reciprocal rank fusion: score(id) = sum_i weight_i / (k + rank_i(id)), with
+    1-based ranks. Returns ids sorted by fused score.
+    """
+    fused: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if weight <= 0:
+            continue
+        for rank, cid in enumerate(ranking, start=1):
+            fused[cid] = fused.get(cid, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda kv: -kv[1])
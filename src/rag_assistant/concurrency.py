@@ -0,0 +1,121 @@
+# src/rag_assistant/concurrency.py
+
+import asyncio
+import threading
+from concurrent.futures import Executor
+from typing import Callable, List, Tuple
+
+
+class AdmissionControl:
+    """
+    Caps concurrent in-flight requests. `try_acquire()` never waits: callers
+    above the limit are rejected immediately (503) instead of queueing without
+    bound, which keeps tail latency predictable under overload.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.inflight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.inflight >= self.limit:
+                self.rejected += 1
+                return False
+            self.inflight += 1
+            self.admitted += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.inflight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "inflight": self.inflight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+async def run_in(executor: Executor, fn: Callable, *args):
+    """Run a blocking call on a dedicated executor from async code."""
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls into one batched call.
+
+    The first pending item starts a `max_wait` (seconds) timer; the batch is
+    flushed when the timer fires or `max_batch` items are pending, whichever
+    comes first. `fn(items) -> results` runs on `executor` and each caller
+    gets its own result back (or the batch's exception).
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List], List],
+        executor: Executor,
+        max_batch: int = 32,
+        max_wait: float = 0.002,
+    ):
+        self.fn = fn
+        self.executor = executor
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+        self._pending: List[Tuple[object, asyncio.Future]] = []
+        self._timer = None
+        self._tasks = set()  # strong refs so in-flight batches aren't garbage collected
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((item, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        self.items += len(batch)
+        self.largest = max(self.largest, len(batch))
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch) -> None:
+        try:
+            results = await run_in(self.executor, self.fn, [item for item, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.largest,
+            "limits": {"max_batch": self.max_batch, "max_wait_ms": self.max_wait * 1000},
+        }
@@ -7,10 +7,89 @@ load_dotenv()
 @dataclass(frozen=True)
 class Settings:
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # "torch" (sentence-transformers) or "onnx": ONNX Runtime on CPU with the
+    # model exported once to ONNX_CACHE_DIR, int8 weights unless ONNX_QUANTIZE=0,
+    # ONNX_THREADS intra-op threads (0 = measure the fastest once).
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    ONNX_CACHE_DIR: str = os.getenv("ONNX_CACHE_DIR", "./.cache/onnx")
+    ONNX_QUANTIZE: bool = os.getenv("ONNX_QUANTIZE", "1") not in ("0", "false", "no", "")
+    ONNX_THREADS: int = int(os.getenv("ONNX_THREADS", "0"))
+    # "chroma", or "numpy": exact search over a memory-mapped matrix in
+    # CHROMA_DIR/numpy (NUMPY_DTYPE float32, or float16 for half the memory).
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "chroma")
+    NUMPY_DTYPE: str = os.getenv("NUMPY_DTYPE", "float32")
+    # Compact index scanned by the numpy backend, chosen at ingest: "none",
+    # "int8" or "binary" (Hamming); the best QUANT_RESCORE_FACTOR * k
+    # candidates are re-ranked exactly against the float vectors.
+    NUMPY_QUANTIZATION: str = os.getenv("NUMPY_QUANTIZATION", "none")
+    QUANT_RESCORE_FACTOR: int = int(os.getenv("QUANT_RESCORE_FACTOR", "10"))
     CHROMA_DIR: str = os.getenv("CHROMA_DIR", "./storage")
     DATA_DIR: str = os.getenv("DATA_DIR", "./data")
     LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "none")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
+    # Generation: model and endpoint overrides (empty = provider default), per-call
+    # timeout in seconds, retries on transient errors, and max concurrent calls.
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "")
+    LLM_BASE_URL: str = os.getenv("LLM_BASE_URL", "")
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "30"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    # Default retrieval for /ask and the CLI: "vector", "hybrid" (BM25 + vector,
+    # RRF) or "mmr" (top MMR_FETCH_K by vector, then diversified; lambda 1 = pure relevance).
+    RETRIEVAL_MODE: str = os.getenv("RETRIEVAL_MODE", "vector")
+    MMR_FETCH_K: int = int(os.getenv("MMR_FETCH_K", "20"))
+    MMR_LAMBDA: float = float(os.getenv("MMR_LAMBDA", "0.5"))
+    # Optional cross-encoder rerank (empty model disables it): over-fetch
+    # RERANK_CANDIDATES chunks, rescore them, keep the top k. /ask skips the
+    # pass when it would end later than RERANK_DEADLINE_MS after the request began.
+    RERANK_MODEL: str = os.getenv("RERANK_MODEL", "")
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", "20"))
+    RERANK_BATCH_SIZE: int = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+    RERANK_CACHE_SIZE: int = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+    RERANK_DEADLINE_MS: float = float(os.getenv("RERANK_DEADLINE_MS", "250"))
+    # Approximate tokens of deduplicated, packed context sent to the LLM.
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+    # Chunk length unit: "chars" (1000 characters, 200 overlap) or "tokens":
+    # measured with the embedding model's tokenizer so each chunk fits its max
+    # sequence length, overlapping by CHUNK_TOKEN_OVERLAP tokens.
+    CHUNK_UNIT: str = os.getenv("CHUNK_UNIT", "chars")
+    CHUNK_TOKEN_OVERLAP: int = int(os.getenv("CHUNK_TOKEN_OVERLAP", "50"))
+    # Processes used to parse files during ingest (1 = load in-process).
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "1"))
+    # Chunks per embedding forward pass ("auto" measures the best size on this CPU)
+    # and per Chroma upsert (capped at the client's max batch size).
+    EMBED_BATCH_SIZE: str = os.getenv("EMBED_BATCH_SIZE", "64")
+    # Ingest embedding processes (1 = embed in-process), each loading the model
+    # once and pinned to EMBED_THREADS_PER_PROCESS threads (0 = CPUs / processes).
+    EMBED_PROCESSES: int = int(os.getenv("EMBED_PROCESSES", "1"))
+    EMBED_THREADS_PER_PROCESS: int = int(os.getenv("EMBED_THREADS_PER_PROCESS", "0"))
+    UPSERT_BATCH_SIZE: int = int(os.getenv("UPSERT_BATCH_SIZE", "512"))
+    # Max items buffered between ingest pipeline stages.
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+    # In-memory LRU of normalized question -> query embedding (TTL in seconds, 0 = none).
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    QUERY_CACHE_TTL: float = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+    # /ask response cache; entries are keyed on the index generation, so they
+    # are never served once ingest has changed the data.
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", "2048"))
+    # Paraphrase cache: reuse an answer when a question's embedding is within
+    # SEMANTIC_CACHE_DISTANCE cosine distance of a recent one (size 0 disables).
+    SEMANTIC_CACHE_SIZE: int = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+    SEMANTIC_CACHE_DISTANCE: float = float(os.getenv("SEMANTIC_CACHE_DISTANCE", "0.05"))
+    # /ask concurrency: threads for query encoding and for Chroma searches, and
+    # the number of in-flight requests admitted before answering 503 (a whole
+    # /ask/batch counts as one, capped at MAX_BATCH_ITEMS questions).
+    EMBED_WORKERS: int = int(os.getenv("EMBED_WORKERS", "2"))
+    SEARCH_WORKERS: int = int(os.getenv("SEARCH_WORKERS", "4"))
+    MAX_INFLIGHT_ASKS: int = int(os.getenv("MAX_INFLIGHT_ASKS", "64"))
+    MAX_BATCH_ITEMS: int = int(os.getenv("MAX_BATCH_ITEMS", "1000"))
+    # Micro-batching of concurrent /ask query embeddings: flush after this many
+    # questions or this many milliseconds, whichever comes first.
+    QUERY_BATCH_MAX_SIZE: int = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+    QUERY_BATCH_MAX_WAIT_MS: float = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "2"))
+    # On-disk embedding cache (empty path disables it); lives outside CHROMA_DIR on purpose.
+    EMBED_CACHE_PATH: str = os.getenv("EMBED_CACHE_PATH", "./.cache/embeddings.sqlite")
+    EMBED_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "1000000"))
 
 settings = Settings()
@@ -0,0 +1,158 @@
+# src/rag_assistant/embed_pool.py
+
+import math
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Set in each worker process by _init_worker.
+_worker_embeddings = None
+_worker_cache_name = None
+
+
+def _pin_threads(threads: int) -> None:
+    """Cap every math library's thread pool in this process to `threads`."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _worker_embeddings, _worker_cache_name
+    _pin_threads(threads)
+    from .embeddings import cache_name_for, load_base_embeddings
+
+    _worker_embeddings = load_base_embeddings(model_name, threads=threads)
+    _worker_cache_name = cache_name_for(_worker_embeddings, model_name)
+
+
+def _worker_describe() -> Tuple[str, int]:
+    return _worker_cache_name, os.getpid()
+
+
+def _worker_tokenizer_source() -> Optional[Tuple[str, int]]:
+    from .embeddings import tokenizer_source
+
+    return tokenizer_source(_worker_embeddings)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # The parent owns (and unlinks) the segment; workers only borrow it. Before
+    # Python 3.13 attaching re-registers the name with the resource tracker the
+    # workers share with the parent, which is harmless (it is already there).
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker_embed(name: str, text_ends: List[int], dim: int, batch_size: int) -> int:
+    """Decode texts from the segment, embed them, write float32 vectors after the texts."""
+    shm = _attach(name)
+    try:
+        blob = bytes(shm.buf[:text_ends[-1] if text_ends else 0])
+        starts = [0] + text_ends[:-1]
+        texts = [blob[s:e].decode("utf-8") for s, e in zip(starts, text_ends)]
+        _set_batch_size(_worker_embeddings, batch_size)
+        vectors = np.asarray(_worker_embeddings.embed_documents(texts), dtype=np.float32)
+        out = np.ndarray((len(texts), dim), dtype=np.float32, buffer=shm.buf, offset=_vector_offset(text_ends))
+        out[:] = vectors
+        del out
+        return len(texts)
+    finally:
+        shm.close()
+
+
+def _worker_dimension() -> int:
+    return len(_worker_embeddings.embed_query("dimension probe"))
+
+
+def _vector_offset(text_ends: List[int]) -> int:
+    end = text_ends[-1] if text_ends else 0
+    return (end + 63) // 64 * 64  # keep the float32 block cache-line aligned
+
+
+def _set_batch_size(embeddings, batch_size: int) -> None:
+    from .embeddings import set_batch_size
+
+    set_batch_size(embeddings, batch_size)
+
+
+class EmbeddingPool(Embeddings):
+    """
+    Embeds documents in `processes` worker processes, each of which loads the
+    model once and pins its math libraries to `threads` intra-op threads.
+
+    A call is split into per-worker batches; for each batch the parent writes
+    the UTF-8 texts into a shared-memory segment and the worker writes the
+    float32 vectors back into the same segment, so neither texts nor vectors
+    are pickled. Workers are spawned (not forked) so no PyTorch thread state
+    is inherited. Used as the base of CachedEmbeddings: only cache misses
+    reach the workers.
+    """
+
+    def __init__(self, model_name: str, processes: int, threads: int = 0, batch_size: int = 64):
+        self.model_name = model_name
+        self.processes = max(1, processes)
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.processes)
+        self.batch_size = batch_size
+        self._executor = ProcessPoolExecutor(
+            self.processes,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, self.threads),
+        )
+        self.cache_name, _ = self._executor.submit(_worker_describe).result()
+        self.dimension = self._executor.submit(_worker_dimension).result()
+
+    def _split(self, n: int) -> List[Tuple[int, int]]:
+        """Spread n texts over the workers in slices of at most batch_size (at least 1 slice each)."""
+        per = min(self.batch_size, max(1, math.ceil(n / self.processes)))
+        return [(i, min(n, i + per)) for i in range(0, n, per)]
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        out = np.empty((len(texts), self.dimension), dtype=np.float32)
+        jobs = []
+        try:
+            for lo, hi in self._split(len(texts)):
+                encoded = [t.encode("utf-8") for t in texts[lo:hi]]
+                ends = np.cumsum([len(b) for b in encoded]).tolist()
+                size = _vector_offset(ends) + (hi - lo) * self.dimension * 4
+                shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+                shm.buf[:ends[-1]] = b"".join(encoded)
+                future = self._executor.submit(_worker_embed, shm.name, ends, self.dimension, self.batch_size)
+                jobs.append((lo, hi, ends, shm, future))
+            for lo, hi, ends, shm, future in jobs:
+                future.result()
+                view = np.ndarray((hi - lo, self.dimension), dtype=np.float32, buffer=shm.buf, offset=_vector_offset(ends))
+                out[lo:hi] = view
+                del view
+        finally:
+            for _, _, _, shm, _ in jobs:
+                shm.close()
+                shm.unlink()
+        return out
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(list(texts)).tolist() if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def tokenizer_source(self) -> Optional[Tuple[str, int]]:
+        return self._executor.submit(_worker_tokenizer_source).result()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
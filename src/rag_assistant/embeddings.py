@@ -0,0 +1,275 @@
+# src/rag_assistant/embeddings.py
+
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from .config import settings
+from .embed_pool import EmbeddingPool
+from .onnx_embeddings import OnnxEmbeddings, onnx_embeddings
+
+
+def normalize_text(text: str) -> str:
+    """NFC + collapsed whitespace; the tokenizer ignores the difference anyway."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+def cache_key(model_name: str, kind: str, text: str) -> bytes:
+    """Key on (model, query-or-document, normalized text) so models never share vectors."""
+    payload = f"{model_name}\0{kind}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).digest()
+
+
+class EmbeddingCache:
+    """
+    Size-bounded on-disk vector cache backed by SQLite.
+
+    Vectors are stored as raw float32 blobs. When more than `max_entries` rows
+    exist, the least recently used ones are evicted. Safe to share between
+    threads; separate processes can open the same file (WAL mode).
+    """
+
+    def __init__(self, path: str, max_entries: int = 1_000_000):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "key BLOB PRIMARY KEY, vec BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS vectors_lru ON vectors(last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        found: Dict[bytes, List[float]] = {}
+        if not keys:
+            return found
+        with self._lock:
+            # SQLite caps bound parameters per statement, so look up in slices.
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM vectors WHERE key IN ({marks})", part
+                ).fetchall()
+                for key, vec in rows:
+                    found[key] = np.frombuffer(vec, dtype=np.float32).tolist()
+            if found:
+                now = time.time_ns()
+                self._conn.executemany(
+                    "UPDATE vectors SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[bytes, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time_ns()
+        rows = [(k, np.asarray(v, dtype=np.float32).tobytes(), now) for k, v in items.items()]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO vectors (key, vec, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._count += self._conn.total_changes - before
+            excess = self._count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM vectors WHERE key IN "
+                    "(SELECT key FROM vectors ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": self._count,
+        }
+
+
+def _as_float32(vectors) -> List[List[float]]:
+    # Round misses the same way as hits, so results never depend on cache state.
+    return np.asarray(vectors, dtype=np.float32).tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the underlying model."""
+
+    def __init__(self, base: Embeddings, cache: EmbeddingCache, model_name: str):
+        self.base = base
+        self.cache = cache
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.model_name, "doc", t) for t in texts]
+        found = self.cache.get_many(list(set(keys)))
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = _as_float32(self.base.embed_documents(list(missing.values())))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return [list(found[k]) for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.model_name, "query", t) for t in texts]
+        found = self.cache.get_many(list(set(keys)))
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = _as_float32(embed_queries(self.base, list(missing.values())))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return [list(found[k]) for k in keys]
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Embed several queries in one forward pass where the backend allows it."""
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.embed_queries(texts)
+    if isinstance(embeddings, HuggingFaceEmbeddings):
+        kwargs = embeddings.query_encode_kwargs or embeddings.encode_kwargs
+        return embeddings._embed(texts, kwargs)
+    if isinstance(embeddings, OnnxEmbeddings):
+        return embeddings.embed_documents(texts)
+    return [embeddings.embed_query(t) for t in texts]
+
+
+# Batch sizes tried by autotune_batch_size, smallest first.
+BATCH_CANDIDATES = (8, 16, 32, 64, 128, 256)
+
+
+def _unwrap(embeddings: Embeddings) -> Embeddings:
+    return embeddings.base if isinstance(embeddings, CachedEmbeddings) else embeddings
+
+
+def set_batch_size(embeddings: Embeddings, batch_size: int) -> None:
+    """Set the forward-pass batch size of the underlying sentence-transformers model."""
+    base = _unwrap(embeddings)
+    if isinstance(base, HuggingFaceEmbeddings):
+        base.encode_kwargs = {**base.encode_kwargs, "batch_size": batch_size}
+    elif isinstance(base, (OnnxEmbeddings, EmbeddingPool)):
+        base.batch_size = batch_size
+
+
+def tokenizer_source(embeddings: Embeddings) -> Optional[Tuple[str, int]]:
+    """
+    The model's fast tokenizer serialized as JSON plus its max sequence length
+    in tokens (special tokens included), or None if the backend has neither.
+    """
+    base = _unwrap(embeddings)
+    if isinstance(base, EmbeddingPool):
+        return base.tokenizer_source()
+    if isinstance(base, OnnxEmbeddings):
+        return base.tokenizer.to_str(), base.meta["max_seq_length"]
+    if isinstance(base, HuggingFaceEmbeddings):
+        st = base._client
+        if getattr(st.tokenizer, "is_fast", False):
+            return st.tokenizer.backend_tokenizer.to_str(), st.max_seq_length or st.tokenizer.model_max_length
+    return None
+
+
+def autotune_batch_size(
+    embeddings: Embeddings, sample_text: str, candidates=BATCH_CANDIDATES, rounds: int = 2
+) -> int:
+    """
+    Pick the batch size with the best measured texts/second on this machine.
+
+    Each candidate embeds `rounds` batches of distinct chunk-sized texts (after
+    one warm-up batch), bypassing the cache. The search stops once throughput
+    falls clearly below the best seen, since larger batches won't recover.
+    """
+    base = _unwrap(embeddings)
+    best, best_rate = candidates[0], 0.0
+    for n in candidates:
+        set_batch_size(base, n)
+        texts = [f"{i} {sample_text}" for i in range(n * (rounds + 1))]
+        base.embed_documents(texts[:n])
+        t0 = time.perf_counter()
+        base.embed_documents(texts[n:])
+        rate = n * rounds / (time.perf_counter() - t0)
+        if rate > best_rate:
+            best, best_rate = n, rate
+        elif rate < best_rate * 0.9:
+            break
+    set_batch_size(base, best)
+    return best
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _shared_cache(path: str) -> EmbeddingCache:
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = EmbeddingCache(path, settings.EMBED_CACHE_MAX_ENTRIES)
+        return _caches[path]
+
+
+def load_base_embeddings(model_name: str, threads: int = 0) -> Embeddings:
+    """The uncached model: ONNX Runtime with EMBEDDING_BACKEND=onnx, else PyTorch."""
+    if settings.EMBEDDING_BACKEND.strip().lower() == "onnx":
+        base = onnx_embeddings(
+            model_name, settings.ONNX_CACHE_DIR, settings.ONNX_QUANTIZE, threads or settings.ONNX_THREADS
+        )
+        if base is not None:
+            return base
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+def cache_name_for(base: Embeddings, model_name: str) -> str:
+    # Quantized ONNX vectors differ slightly from PyTorch ones: cache them apart.
+    if isinstance(base, EmbeddingPool):
+        return base.cache_name
+    if isinstance(base, OnnxEmbeddings):
+        return f"{model_name}#onnx-{base.model_path.stem}"
+    return model_name
+
+
+def get_embeddings(model_name: Optional[str] = None, processes: int = 1) -> Embeddings:
+    """
+    The configured embedding model (PyTorch, or ONNX Runtime with
+    EMBEDDING_BACKEND=onnx), wrapped in the on-disk cache when enabled.
+    With processes > 1 the model runs in a pool of worker processes.
+    """
+    model_name = model_name or settings.EMBEDDING_MODEL
+    if processes > 1:
+        base = EmbeddingPool(model_name, processes, settings.EMBED_THREADS_PER_PROCESS)
+    else:
+        base = load_base_embeddings(model_name)
+    if not settings.EMBED_CACHE_PATH:
+        return base
+    return CachedEmbeddings(base, _shared_cache(settings.EMBED_CACHE_PATH), cache_name_for(base, model_name))
@@ -1,85 +1,426 @@
 # src/rag_assistant/ingest.py
 
+import multiprocessing as mp
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 from langchain_community.document_loaders import (
-    DirectoryLoader,
     TextLoader,
     PyPDFLoader,
 )
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
 
+from .bm25 import BM25_NAME, BM25Index
 from .config import settings
+from .embed_pool import EmbeddingPool
+from .embeddings import CachedEmbeddings, autotune_batch_size, get_embeddings, set_batch_size, tokenizer_source
+from .manifest import Manifest, bump_generation, chunk_id
+from .numpy_store import NumpyStore
+from .pipeline import run_pipeline
+from .retriever import open_vectorstore
+from .splitter import OffsetTextSplitter, TokenTextSplitter
 
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
 
-def _load_documents(data_dir: str) -> List:
-    """Load MD/TXT/PDF from data_dir with encoding autodetect for text files."""
+TEXT_KWARGS = {"encoding": "utf-8", "autodetect_encoding": True}
+
+# File extension -> (loader class, loader kwargs)
+LOADERS = {
+    ".md": (TextLoader, TEXT_KWARGS),
+    ".txt": (TextLoader, TEXT_KWARGS),
+    ".pdf": (PyPDFLoader, {}),
+}
+
+
+def _iter_files(data_dir: str) -> List[Path]:
+    """Supported files directly under data_dir, in a stable order."""
     data_path = Path(data_dir)
-    if not data_path.exists():
-        print(f"[ingest] Data dir does not exist: {data_path}")
-        return []
-
-    loaders = [
-        DirectoryLoader(
-            str(data_path),
-            glob="*.md",
-            loader_cls=TextLoader,
-            loader_kwargs={"encoding": "utf-8", "autodetect_encoding": True},
-        ),
-        DirectoryLoader(
-            str(data_path),
-            glob="*.txt",
-            loader_cls=TextLoader,
-            loader_kwargs={"encoding": "utf-8", "autodetect_encoding": True},
-        ),
-        DirectoryLoader(
-            str(data_path),
-            glob="*.pdf",
-            loader_cls=PyPDFLoader,
-        ),
-    ]
-
-    docs: List = []
-    for ld in loaders:
-        try:
-            docs.extend(ld.load())
-        except Exception as e:
-            print(f"[ingest] Loader error ({ld}): {e}")
-
-    # Strip stray UTF-8 BOM chars to avoid Windows console/test failures.
+    files: List[Path] = []
+    for ext in LOADERS:
+        files.extend(sorted(data_path.glob(f"*{ext}")))
+    return files
+
+
+def _load_file(path: Path) -> List:
+    """Load one file with the loader for its extension."""
+    loader_cls, kwargs = LOADERS[path.suffix.lower()]
+    return loader_cls(str(path), **kwargs).load()
+
+
+def _clean(docs: List) -> List:
+    """Strip stray UTF-8 BOM chars (avoids Windows console/test failures) and drop empty docs."""
     for d in docs:
         if getattr(d, "page_content", None):
             d.page_content = d.page_content.replace("\ufeff", "")
+    return [d for d in docs if (d.page_content or "").strip()]
+
+
+def _load_file_safe(path: Path) -> Tuple[Path, List, Optional[str]]:
+    """_load_file that reports failures instead of raising (runs in pool workers)."""
+    try:
+        return path, _load_file(path), None
+    except Exception as e:
+        return path, [], str(e)
+
+
+def _iter_loaded(paths: Iterable[Path], workers: int = 1) -> Iterator[Tuple[Path, List, Optional[str]]]:
+    """
+    Yield (path, docs, error) for each file as soon as it is loaded.
+
+    With workers > 1 files are parsed in a process pool (PDF parsing is
+    CPU-bound); results stream back in completion order and at most a few
+    files per worker are in flight, so memory stays bounded. A failing or
+    crashing file only affects its own result. Workers are spawned, not
+    forked: this runs in a pipeline thread while other stages run PyTorch.
+    """
+    if workers <= 1:
+        for path in paths:
+            yield _load_file_safe(path)
+        return
+
+    paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        pending = {}
+
+        def fill():
+            while len(pending) < workers * 4:
+                path = next(paths, None)
+                if path is None:
+                    return
+                pending[pool.submit(_load_file_safe, path)] = path
+
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                path = pending.pop(fut)
+                try:
+                    yield fut.result()
+                except Exception as e:  # e.g. worker killed while parsing
+                    yield path, [], str(e)
+            fill()
+
+
+class _FileChunks:
+    """Chunks and deterministic ids produced from one source file."""
+
+    def __init__(self, path: Path, chunks: List, ids: List[str]):
+        self.path = path
+        self.chunks = chunks
+        self.ids = ids
+
+
+class _Batch:
+    """A batch of chunks on its way to the store, plus the files it completes."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[dict] = []
+        self.vectors: List[List[float]] = []
+        self.files: List[_FileChunks] = []
+
+    def add(self, cid: str, chunk) -> None:
+        self.ids.append(cid)
+        self.texts.append(chunk.page_content)
+        self.metadatas.append(chunk.metadata)
+
+    def extend(self, other: "_Batch") -> None:
+        self.ids += other.ids
+        self.texts += other.texts
+        self.metadatas += other.metadatas
+        self.vectors += other.vectors
+        self.files += other.files
+
+    def embed(self, embeddings) -> "_Batch":
+        if self.texts:
+            self.vectors = embeddings.embed_documents(self.texts)
+        return self
+
+
+def _embed_batch_size(embeddings) -> int:
+    """Resolve EMBED_BATCH_SIZE, measuring the fastest size when it is "auto"."""
+    if settings.EMBED_BATCH_SIZE.strip().lower() == "auto":
+        size = autotune_batch_size(embeddings, "lorem ipsum " * (CHUNK_SIZE // 12))
+        print(f"[ingest] Auto-tuned embedding batch size: {size}")
+        return size
+    size = int(settings.EMBED_BATCH_SIZE)
+    set_batch_size(embeddings, size)
+    return size
+
+
+def _chunking_spec(unit: str) -> str:
+    """Recorded in the manifest: a different spec re-splits every file."""
+    if unit == "tokens":
+        return f"tokens:{settings.EMBEDDING_MODEL}:{settings.CHUNK_TOKEN_OVERLAP}"
+    return f"chars:{CHUNK_SIZE}:{CHUNK_OVERLAP}"
+
+
+def _splitter(embeddings, unit: str) -> OffsetTextSplitter:
+    if unit == "tokens":
+        source = tokenizer_source(embeddings)
+        if source is not None:
+            from tokenizers import Tokenizer
 
-    return docs
+            tokenizer_json, max_tokens = source
+            splitter = TokenTextSplitter(Tokenizer.from_str(tokenizer_json), max_tokens, settings.CHUNK_TOKEN_OVERLAP)
+            print(f"[ingest] Token chunking: up to {max_tokens} tokens per chunk, {splitter.chunk_overlap} overlap")
+            return splitter
+        print("[ingest] CHUNK_UNIT=tokens needs a model with a fast tokenizer; splitting by characters.")
+    return OffsetTextSplitter(CHUNK_SIZE, CHUNK_OVERLAP)
+
+
+def _upsert_batch_size(vs) -> int:
+    """UPSERT_BATCH_SIZE, capped at what the Chroma client accepts in one call."""
+    try:
+        limit = vs._client.get_max_batch_size()
+    except Exception:
+        return settings.UPSERT_BATCH_SIZE
+    return max(1, min(settings.UPSERT_BATCH_SIZE, limit))
+
+
+def _upsert_vectors(vs, ids, vectors, texts, metadatas) -> None:
+    """Store precomputed embeddings (the LangChain Chroma API would re-embed)."""
+    if isinstance(vs, NumpyStore):
+        vs.upsert(ids, vectors, texts, metadatas)
+    else:
+        vs._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+
+
+def _backfill_bm25(vs, bm25: BM25Index, page: int = 5000) -> int:
+    """Index every chunk already stored in Chroma; returns how many were added."""
+    offset = 0
+    while True:
+        got = vs.get(limit=page, offset=offset, include=["documents"])
+        if not got["ids"]:
+            return offset
+        bm25.upsert(got["ids"], got["documents"])
+        offset += len(got["ids"])
+
+
+def ingest_dir(
+    data_dir: str,
+    chroma_dir: str,
+    embeddings=None,
+    backend: str = None,
+    quantization: str = None,
+    chunk_unit: str = None,
+) -> dict:
+    """
+    Incrementally sync data_dir into the vector store at chroma_dir
+    (`backend` "chroma" or "numpy", default VECTOR_BACKEND; `quantization`
+    of a numpy store, default NUMPY_QUANTIZATION; `chunk_unit` "chars" or
+    "tokens", default CHUNK_UNIT).
+
+    Only new or changed files are loaded, split and embedded; chunks of removed
+    or changed files are deleted. Chunk ids are deterministic, so re-runs are
+    idempotent. Files stream through load -> clean -> split -> embed -> upsert
+    stages joined by bounded queues, so memory stays flat whatever the corpus
+    size. Returns counts of added/updated/removed/unchanged files, ingested
+    chunks and per-stage throughput.
+    """
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "chunks": 0}
+    manifest = Manifest.load(chroma_dir)
+    data_path = Path(data_dir)
+    if data_path.exists():
+        files = _iter_files(data_dir)
+    else:
+        print(f"[ingest] Data dir does not exist: {data_path}")
+        files = []
+
+    backend = (backend or settings.VECTOR_BACKEND).strip().lower()
+    quantization = quantization or settings.NUMPY_QUANTIZATION
+    # Switching backends re-embeds everything (cheap with the embedding cache):
+    # the other store may be empty or hold chunks of files changed since it was
+    # last written. Manifests that predate the field were written by Chroma.
+    state = NumpyStore.read_state(chroma_dir) if backend == "numpy" else None
+    switched = bool(manifest.files) and (manifest.backend or "chroma") != backend
+    rebuild = switched or (backend == "numpy" and state is None)
+    manifest.backend = backend
+    # A different NUMPY_QUANTIZATION only re-encodes the stored vectors.
+    requantize = state is not None and state.get("quantization", "none") != quantization
+    # Changed chunking re-splits (and re-embeds) every file; manifests written
+    # before chunking was recorded used the character defaults.
+    chunk_unit = (chunk_unit or settings.CHUNK_UNIT).strip().lower()
+    chunking = _chunking_spec(chunk_unit)
+    rechunk = bool(manifest.files) and (manifest.chunking or _chunking_spec("chars")) != chunking
+    manifest.chunking = chunking
+
+    todo = []
+    for path in files:
+        if not rebuild and not rechunk and manifest.is_unchanged(str(path), path):
+            stats["unchanged"] += 1
+        else:
+            todo.append(path)
+    current = {str(p) for p in files}
+    removed = [key for key in manifest.files if key not in current]
+
+    # Stores ingested before the BM25 index existed get it built from Chroma.
+    backfill = bool(manifest.files) and not (Path(chroma_dir) / BM25_NAME).exists()
+
+    if not todo and not removed and not backfill and not requantize:
+        if manifest.files:
+            manifest.save()  # persist refreshed size/mtime fast-path entries
+        return stats
+
+    owned = embeddings is None
+    if owned:
+        embeddings = get_embeddings(processes=settings.EMBED_PROCESSES)
+    base = embeddings.base if isinstance(embeddings, CachedEmbeddings) else embeddings
+    pool = base if isinstance(base, EmbeddingPool) else None
+    vs = open_vectorstore(embeddings, chroma_dir, backend, quantization)
+    # A store without a manifest (written before ingestion was incremental,
+    # with random chunk ids) would keep its chunks next to the new copies.
+    unowned = not manifest.files and (len(vs) if isinstance(vs, NumpyStore) else vs._collection.count()) > 0
+    if unowned:
+        print("[ingest] Existing store has no manifest; rebuilding it.")
+    if switched or unowned:
+        if isinstance(vs, NumpyStore):
+            vs.clear()
+        else:
+            vs.reset_collection()
+    bm25 = BM25Index.load(chroma_dir)
+    if backfill:
+        stats["bm25_backfilled"] = _backfill_bm25(vs, bm25)
+
+    for key in removed:
+        ids = manifest.remove(key)
+        if ids:
+            vs.delete(ids=ids)
+            bm25.remove(ids)
+        stats["removed"] += 1
+
+    splitter = _splitter(embeddings, chunk_unit)
+    embed_size = _embed_batch_size(embeddings)
+    if pool is not None:
+        embed_size *= pool.processes  # one forward-pass batch per worker per call
+    upsert_size = _upsert_batch_size(vs)
+
+    def load(paths):
+        yield from _iter_loaded(paths, settings.INGEST_WORKERS)
+
+    def clean(loaded):
+        for path, docs, error in loaded:
+            if error:
+                print(f"[ingest] Loader error ({path}): {error}")
+                continue
+            yield path, _clean(docs)
+
+    def split(cleaned):
+        for path, docs in cleaned:
+            key = str(path)
+            chunks = splitter.split_documents(docs)
+            ids = [chunk_id(key, i, c.page_content) for i, c in enumerate(chunks)]
+            yield _FileChunks(path, chunks, ids)
+
+    def embed(files):
+        batch = _Batch()
+        for fc in files:
+            for cid, chunk in zip(fc.ids, fc.chunks):
+                batch.add(cid, chunk)
+                if len(batch.ids) >= embed_size:
+                    yield batch.embed(embeddings)
+                    batch = _Batch()
+            # The file is complete once the batch holding its last chunk is upserted.
+            batch.files.append(fc)
+        if batch.ids or batch.files:
+            yield batch.embed(embeddings)
+
+    def flush(pending: _Batch) -> None:
+        for i in range(0, len(pending.ids), upsert_size):
+            _upsert_vectors(
+                vs,
+                pending.ids[i:i + upsert_size],
+                pending.vectors[i:i + upsert_size],
+                pending.texts[i:i + upsert_size],
+                pending.metadatas[i:i + upsert_size],
+            )
+        bm25.upsert(pending.ids, pending.texts)
+        # Only now are all chunks of these files in the store.
+        for fc in pending.files:
+            key = str(fc.path)
+            fresh = set(fc.ids)
+            stale = [i for i in manifest.ids(key) if i not in fresh]
+            if stale:
+                vs.delete(ids=stale)
+                bm25.remove(stale)
+            stats["updated" if key in manifest.files else "added"] += 1
+            stats["chunks"] += len(fc.ids)
+            manifest.record(key, fc.path, fc.ids)
+
+    def upsert(batches):
+        pending = _Batch()
+        for batch in batches:
+            pending.extend(batch)
+            if len(pending.ids) >= upsert_size:
+                flush(pending)
+                yield pending
+                pending = _Batch()
+        if pending.ids or pending.files:
+            flush(pending)
+            yield pending
+
+    # Throughput is counted in files for the first two stages, chunks after that.
+    try:
+        stats["stages"] = run_pipeline(
+            todo,
+            [
+                ("load", load, lambda item: 1),
+                ("clean", clean, lambda item: 1),
+                ("split", split, lambda item: len(item.ids)),
+                ("embed", embed, lambda item: len(item.ids)),
+                ("upsert", upsert, lambda item: len(item.ids)),
+            ],
+            maxsize=settings.PIPELINE_QUEUE_SIZE,
+        )
+    finally:
+        # Also when a stage failed: don't leave the spawned embedding workers behind.
+        if owned and pool is not None:
+            pool.close()
+
+    if isinstance(vs, NumpyStore):
+        vs.persist(force=requantize)
+        if vs.quantization != "none":
+            stats["vector_index"] = {**vs.memory(), "recall_at_10": vs.recall(k=10)}
+    bm25.save(chroma_dir)
+    manifest.save()
+    if stats["added"] or stats["updated"] or stats["removed"] or backfill or requantize:
+        stats["generation"] = bump_generation(chroma_dir)
+    if isinstance(embeddings, CachedEmbeddings):
+        stats["embed_cache"] = embeddings.cache.stats()
+    return stats
 
 
 def main():
     print(f"[ingest] Loading documents from: {settings.DATA_DIR}")
-    docs = _load_documents(settings.DATA_DIR)
+    stats = ingest_dir(settings.DATA_DIR, settings.CHROMA_DIR)
 
-    if not docs:
+    if not any(stats[k] for k in ("added", "updated", "removed", "unchanged")):
         print("[ingest] No documents found. Put files in ./data and re-run.")
         return
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = splitter.split_documents(docs)
-    print(f"[ingest] Created {len(chunks)} chunks")
-
-    embeddings = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
-    vs = Chroma(embedding_function=embeddings, persist_directory=settings.CHROMA_DIR)
-
-    # Add & auto-persist (PersistentClient writes to disk automatically)
-    if chunks:
-        vs.add_documents(chunks)
-        print(f"Ingested {len(chunks)} chunks into {settings.CHROMA_DIR}")
+    print(
+        f"[ingest] {stats['added']} added, {stats['updated']} updated, "
+        f"{stats['removed']} removed, {stats['unchanged']} unchanged"
+    )
+    for name, st in stats.get("stages", {}).items():
+        print(f"[ingest] {name}: {st['items']} items in {st['seconds']}s ({st['per_second']}/s)")
+    if "embed_cache" in stats:
+        c = stats["embed_cache"]
+        print(f"[ingest] Embedding cache: {c['hits']} hits, {c['misses']} misses")
+    if "vector_index" in stats:
+        v = stats["vector_index"]
+        print(
+            f"[ingest] {v['quantization']} index: {v['index_bytes'] / 2**20:.1f} MiB scanned per query "
+            f"vs {v['float32_bytes'] / 2**20:.1f} MiB float32 ({v['saved_ratio']:.0%} saved), "
+            f"estimated recall@10 {v['recall_at_10']:.3f}"
+        )
+    if stats["chunks"]:
+        print(f"Ingested {stats['chunks']} chunks into {settings.CHROMA_DIR}")
     else:
-        print("[ingest] No chunks created; nothing ingested.")
+        print("[ingest] No new chunks; index is up to date.")
 
 
 if __name__ == "__main__":
     main()
-
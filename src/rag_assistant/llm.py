@@ -0,0 +1,205 @@
+# src/rag_assistant/llm.py
+
+import asyncio
+import json
+from typing import AsyncIterator, List, Optional
+
+import httpx
+
+from .config import settings
+
+# Provider name -> (base URL, default model). All speak the OpenAI chat API.
+PROVIDERS = {
+    "openai": ("https://api.openai.com/v1", "gpt-4o-mini"),
+    "groq": ("https://api.groq.com/openai/v1", "llama-3.1-8b-instant"),
+    "local": ("http://127.0.0.1:8001/v1", "stub"),
+}
+
+SYSTEM_PROMPT = (
+    "You answer questions using only the provided context. "
+    "Cite the sources you used in square brackets, e.g. [data/dummy.md]. "
+    "If the context does not contain the answer, say so."
+)
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """Generation failed after all retries."""
+
+
+def build_messages(question: str, docs) -> List[dict]:
+    """Chat messages asking the model to answer `question` from the retrieved chunks."""
+    context = "\n\n".join(
+        f"[{d.metadata.get('source', '?')}]\n{d.page_content}" for d in docs
+    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"},
+    ]
+
+
+class OpenAICompatibleProvider:
+    """
+    Chat-completions client for OpenAI, Groq or any OpenAI-compatible server.
+
+    One pooled `httpx.AsyncClient` (keep-alive connections) is reused for all
+    calls made from the same event loop. Each call has a timeout, is retried
+    with exponential backoff on transport errors and 408/409/429/5xx, and at
+    most `max_concurrency` calls are in flight at once.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        model: str,
+        timeout: float = 30.0,
+        max_retries: int = 2,
+        max_concurrency: int = 16,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    async def _ensure_client(self) -> httpx.AsyncClient:
+        # Connections and semaphores belong to one event loop; rebuild if it changed.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                await self._close_stale(self._client, self._loop)
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                transport=self._transport,
+            )
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    @staticmethod
+    async def _close_stale(client: httpx.AsyncClient, loop) -> None:
+        """Close a client left behind by another event loop, on that loop if it still runs."""
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+        try:
+            await client.aclose()
+        except Exception:
+            pass  # sockets of a closed loop can't be shut down cleanly; they are dropped
+
+    def _payload(self, messages: List[dict], max_tokens: int, stream: bool) -> dict:
+        return {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": 0,
+            "stream": stream,
+        }
+
+    async def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> None:
+        delay = 0.25 * (2 ** attempt)
+        if response is not None:
+            try:
+                delay = max(delay, min(float(response.headers.get("retry-after", 0)), 10.0))
+            except ValueError:
+                pass
+        await asyncio.sleep(delay)
+
+    async def generate(self, messages: List[dict], max_tokens: int = 512) -> str:
+        client = await self._ensure_client()
+        payload = self._payload(messages, max_tokens, stream=False)
+        async with self._slots:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    r = await client.post("/chat/completions", json=payload)
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise LLMError(f"LLM request failed: {e}") from e
+                    await self._backoff(attempt)
+                    continue
+                if r.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                    await self._backoff(attempt, r)
+                    continue
+                if r.status_code != 200:
+                    raise LLMError(f"LLM returned HTTP {r.status_code}: {r.text[:200]}")
+                try:
+                    return r.json()["choices"][0]["message"]["content"] or ""
+                except (KeyError, IndexError, TypeError, ValueError) as e:
+                    raise LLMError(f"LLM returned a malformed response: {r.text[:200]}") from e
+        raise LLMError("LLM request failed")  # unreachable; keeps type checkers happy
+
+    async def stream(self, messages: List[dict], max_tokens: int = 512) -> AsyncIterator[str]:
+        """Yield content deltas. Retries only happen before the first delta is sent."""
+        client = await self._ensure_client()
+        payload = self._payload(messages, max_tokens, stream=True)
+        started = False
+        async with self._slots:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with client.stream("POST", "/chat/completions", json=payload) as r:
+                        if r.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                            await self._backoff(attempt, r)
+                            continue
+                        if r.status_code != 200:
+                            body = (await r.aread()).decode("utf-8", "replace")
+                            raise LLMError(f"LLM returned HTTP {r.status_code}: {body[:200]}")
+                        async for line in r.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                return
+                            try:
+                                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                            except (KeyError, IndexError, TypeError, AttributeError, ValueError) as e:
+                                raise LLMError(f"LLM returned a malformed stream event: {data[:200]}") from e
+                            if delta:
+                                started = True
+                                yield delta
+                        return
+                except httpx.TransportError as e:
+                    # A retry would replay the answer from its start.
+                    if started:
+                        raise LLMError(f"LLM stream interrupted: {e}") from e
+                    if attempt == self.max_retries:
+                        raise LLMError(f"LLM request failed: {e}") from e
+                    await self._backoff(attempt)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def get_provider() -> Optional[OpenAICompatibleProvider]:
+    """Provider selected by LLM_PROVIDER, or None for the extractive fallback."""
+    name = settings.LLM_PROVIDER.strip().lower()
+    if name in ("", "none"):
+        return None
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER {name!r}; expected none, {', '.join(PROVIDERS)}")
+    base_url, model = PROVIDERS[name]
+    api_key = {"openai": settings.OPENAI_API_KEY, "groq": settings.GROQ_API_KEY}.get(name, "")
+    return OpenAICompatibleProvider(
+        base_url=settings.LLM_BASE_URL or base_url,
+        api_key=api_key,
+        model=settings.LLM_MODEL or model,
+        timeout=settings.LLM_TIMEOUT,
+        max_retries=settings.LLM_MAX_RETRIES,
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    )
@@ -0,0 +1,53 @@
+# src/rag_assistant/llm_stub.py
+
+"""
+Local OpenAI-compatible stand-in for tests and load experiments.
+
+    uvicorn rag_assistant.llm_stub:app --port 8001
+    LLM_PROVIDER=local make api
+
+It answers /v1/chat/completions deterministically (no model, no network):
+the reply names the sources found in the prompt and echoes the question.
+"""
+
+import json
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="LLM stub", version="0.1.0")
+
+
+def _reply(messages: list) -> str:
+    prompt = messages[-1]["content"] if messages else ""
+    sources = sorted(set(re.findall(r"^\[([^\]\n]+)\]$", prompt, flags=re.M)))
+    question = prompt.rsplit("Question:", 1)[-1].strip()
+    cited = " ".join(f"[{s}]" for s in sources) or "[no sources]"
+    return f"Stub answer to: {question} {cited}"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    text = _reply(body.get("messages", []))
+    created = int(time.time())
+    model = body.get("model", "stub")
+
+    if not body.get("stream"):
+        return JSONResponse({
+            "id": "stub-1",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        })
+
+    def chunks():
+        for word in re.findall(r"\S+\s*", text):
+            delta = {"choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+            yield f"data: {json.dumps(delta)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
@@ -0,0 +1,132 @@
+# src/rag_assistant/manifest.py
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+MANIFEST_NAME = "ingest_manifest.json"
+GENERATION_NAME = "index_generation"
+
+
+def file_digest(path: Path, block_size: int = 1 << 20) -> str:
+    """sha256 of a file's bytes, read in blocks so large PDFs stay cheap on memory."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_id(source: str, index: int, text: str) -> str:
+    """Deterministic chunk id, so re-ingesting a file overwrites instead of duplicating."""
+    h = hashlib.sha256(f"{source}\0{index}\0{text}".encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+class Manifest:
+    """
+    Persistent map of ingested file -> content hash and chunk ids, stored inside
+    CHROMA_DIR so wiping the store also wipes the manifest.
+
+    Size and mtime are kept as a fast path: a file whose stat is unchanged is
+    not re-hashed, which keeps no-op runs over large corpora cheap.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        files: Optional[Dict[str, dict]] = None,
+        chunking: Optional[str] = None,
+        backend: Optional[str] = None,
+    ):
+        self.path = Path(path)
+        self.files: Dict[str, dict] = files or {}
+        # How the recorded files were chunked and which vector backend holds
+        # them (None: written before this was tracked).
+        self.chunking = chunking
+        self.backend = backend
+
+    @classmethod
+    def load(cls, chroma_dir: str) -> "Manifest":
+        path = Path(chroma_dir) / MANIFEST_NAME
+        if not path.exists():
+            return cls(path)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(path, data.get("files", {}), data.get("chunking"), data.get("backend"))
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "chunking": self.chunking, "backend": self.backend, "files": self.files}, f)
+        os.replace(tmp, self.path)
+
+    def is_unchanged(self, key: str, path: Path) -> bool:
+        """True if `path` still matches its manifest entry (re-hashing only if stat moved)."""
+        entry = self.files.get(key)
+        if entry is None:
+            return False
+        st = path.stat()
+        if entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return True
+        if entry["sha256"] != file_digest(path):
+            return False
+        entry["size"], entry["mtime_ns"] = st.st_size, st.st_mtime_ns
+        return True
+
+    def record(self, key: str, path: Path, ids: List[str]) -> None:
+        st = path.stat()
+        self.files[key] = {
+            "sha256": file_digest(path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "ids": ids,
+        }
+
+    def ids(self, key: str) -> List[str]:
+        entry = self.files.get(key)
+        return list(entry["ids"]) if entry else []
+
+    def remove(self, key: str) -> List[str]:
+        entry = self.files.pop(key, None)
+        return entry["ids"] if entry else []
+
+
+def bump_generation(chroma_dir: str) -> int:
+    """Increment the index generation stored in CHROMA_DIR after a successful write."""
+    path = Path(chroma_dir) / GENERATION_NAME
+    generation = IndexGeneration(chroma_dir).current() + 1
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(str(generation), encoding="utf-8")
+    os.replace(tmp, path)
+    return generation
+
+
+class IndexGeneration:
+    """
+    Reader for the index generation counter. The file is only re-read when its
+    mtime changes, so checking it per request costs a single stat() call.
+    """
+
+    def __init__(self, chroma_dir: str):
+        self.path = Path(chroma_dir) / GENERATION_NAME
+        self._stamp = None
+        self._value = 0
+
+    def current(self) -> int:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if stamp != self._stamp:
+            try:
+                self._value = int(self.path.read_text(encoding="utf-8").strip() or 0)
+            except (OSError, ValueError):
+                return self._value
+            self._stamp = stamp
+        return self._value
@@ -0,0 +1,531 @@
+# src/rag_assistant/numpy_store.py
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .quantize import MODES, fit_int8, hamming, int8_dot, to_bits, to_int8
+
+NUMPY_DIR = "numpy"
+STATE_NAME = "store.json"
+IDS_NAME = "ids.bin"  # newline-joined chunk ids, one per row
+# Sorted 64-bit id hashes and the row of each, for binary-search id lookups.
+ID_HASHES_NAME = "id_hashes.npy"
+ID_ROWS_NAME = "id_rows.npy"
+ID_OFFSETS_NAME = "id_offsets.npy"  # where each row's id starts in ids.bin
+# Rows scored per matrix-vector product; bounds the float32 temporaries of
+# float16 stores and keeps each block cache friendly.
+SEARCH_BLOCK = 2048
+
+
+def _hash_ids(ids: Sequence[str]) -> np.ndarray:
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(cid.encode("utf-8"), digest_size=8).digest(), "little") for cid in ids),
+        dtype=np.uint64,
+        count=len(ids),
+    )
+
+
+class _Snapshot:
+    """One immutable, memory-mapped version of the store."""
+
+    def __init__(self, name=None, vectors=None, sq_norms=None, offsets=None, records=None, dtype=np.float32,
+                 quantization="none", codes=None, params=None, ids_path=None, id_index=None):
+        self.name = name
+        self.ids_path = ids_path
+        self.quantization = quantization
+        self.codes = codes
+        self.params = params or {}
+        self.vectors = vectors if vectors is not None else np.zeros((0, 0), dtype=dtype)
+        self.sq_norms = sq_norms if sq_norms is not None else np.zeros(0, dtype=np.float32)
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        self.records = records if records is not None else np.zeros(0, dtype=np.uint8)
+        # (sorted hashes, their rows, id offsets, ids.bin), all memory-mapped.
+        self.id_index = id_index
+        self._ids: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def blob(self, row: int) -> bytes:
+        return self.records[int(self.offsets[row]):int(self.offsets[row + 1])].tobytes()
+
+    def record(self, row: int) -> dict:
+        return json.loads(self.blob(row).decode("utf-8"))
+
+    def document(self, row: int) -> Document:
+        rec = self.record(row)
+        return Document(page_content=rec["text"], metadata=rec["metadata"] or {}, id=rec["id"])
+
+    def ids(self) -> List[str]:
+        """Chunk id of every row; only snapshots written without an id index need it."""
+        if self._ids is None:
+            if self.ids_path is not None and self.ids_path.exists():
+                blob = self.ids_path.read_bytes().decode("utf-8")
+                self._ids = blob.split("\n") if blob else []
+            else:  # snapshots written before ids.bin existed
+                self._ids = [self.record(i)["id"] for i in range(len(self))]
+        return self._ids
+
+    def _index(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self.id_index is None:
+            hashes = _hash_ids(self.ids())
+            order = np.argsort(hashes, kind="stable")
+            self.id_index = (hashes[order], order, None, None)
+        return self.id_index[0], self.id_index[1]
+
+    def id_bytes(self, row: int) -> bytes:
+        _, _, starts, blob = self.id_index if self.id_index is not None else (None, None, None, None)
+        if starts is None:
+            return self.ids()[row].encode("utf-8")
+        return blob[int(starts[row]):int(starts[row + 1]) - 1].tobytes()
+
+    def row_hashes(self) -> np.ndarray:
+        """The id hash of every row, in row order."""
+        hashes, rows = self._index()
+        out = np.empty(len(self), dtype=np.uint64)
+        out[rows] = hashes
+        return out
+
+    def find(self, ids: Sequence[str]) -> List[Optional[int]]:
+        """Row of each id (None if absent): a binary search over the mapped hashes."""
+        hashes, rows = self._index()
+        wanted = _hash_ids(ids)
+        found = []
+        for cid, h, at in zip(ids, wanted, np.searchsorted(hashes, wanted)):
+            key, row = cid.encode("utf-8"), None
+            while at < len(hashes) and hashes[at] == h:
+                if self.id_bytes(int(rows[at])) == key:
+                    row = int(rows[at])
+                    break
+                at += 1
+            found.append(row)
+        return found
+
+
+class _Staging:
+    """
+    Rows upserted since the last persist(), appended to files in a scratch
+    directory as each batch arrives: float32 vectors, JSON records and their
+    end offsets. Only the id -> staged row map is kept in memory, so a long
+    ingest holds at most one batch of vectors and texts at a time.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.path: Optional[Path] = None
+        self.rows: Dict[str, int] = {}  # id -> staged row of its latest version
+        self.count = 0
+        self.dim: Optional[int] = None
+        self._end = 0
+
+    def append(self, ids: Sequence[str], vectors: np.ndarray, documents: Sequence[str], metadatas: Sequence[dict]) -> None:
+        if not len(ids):
+            return
+        if self.dim is not None and vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match staged rows ({self.dim})")
+        if self.path is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self.path = self.root / f"staging-{int.from_bytes(os.urandom(6), 'big'):012x}"
+            self.path.mkdir()
+        self.dim = vectors.shape[1]
+        ends = np.empty(len(ids), dtype=np.int64)
+        with open(self.path / "records.bin", "ab") as f:
+            for j, (cid, text, meta) in enumerate(zip(ids, documents, metadatas)):
+                blob = json.dumps({"id": cid, "text": text, "metadata": meta}, ensure_ascii=False).encode("utf-8")
+                f.write(blob)
+                self._end += len(blob)
+                ends[j] = self._end
+        with open(self.path / "offsets.bin", "ab") as f:
+            f.write(ends.tobytes())
+        with open(self.path / "vectors.bin", "ab") as f:
+            f.write(np.ascontiguousarray(vectors[:len(ids)]).tobytes())
+        for cid in ids:
+            self.rows[cid] = self.count
+            self.count += 1
+
+    def open(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The staged vectors, record offsets (count + 1) and records, memory-mapped."""
+        vectors = np.memmap(self.path / "vectors.bin", dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        offsets = np.concatenate([[0], np.fromfile(self.path / "offsets.bin", dtype=np.int64)])
+        records = np.memmap(self.path / "records.bin", dtype=np.uint8, mode="r") if self._end else None
+        return vectors, offsets, records
+
+    def discard(self) -> None:
+        if self.path is not None:
+            shutil.rmtree(self.path, ignore_errors=True)
+        self.path, self.rows, self.count, self.dim, self._end = None, {}, 0, None, 0
+
+
+class NumpyStore:
+    """
+    Exact nearest-neighbour search over an embedding matrix memory-mapped
+    from disk, with no database client in the query path.
+
+    Each snapshot is a directory of .npy files written once: `vectors.npy`
+    (float32 or float16, one row per chunk), `sq_norms.npy` and the chunk
+    records (id, text, metadata as JSON) in `records.bin` with `offsets.npy`,
+    plus the ids alone in `ids.bin`. Ids are found by binary search over a
+    sorted array of their 64-bit hashes (`id_hashes.npy`, `id_rows.npy`),
+    which is mapped like everything else instead of rebuilt per process.
+    `store.json` names the current snapshot and is replaced atomically, so
+    readers never see a half-written index and pick up a new snapshot on
+    their next search. Everything is mapped read-only (MAP_SHARED), so
+    forked API workers share the same page-cache pages instead of copying.
+
+    Top-k is one matrix-vector product per block plus `argpartition`, ranked
+    by L2 distance like the default Chroma collection. Writes (ingest) are
+    staged on disk batch by batch and merged into a new snapshot by
+    `persist()`, so ingest memory does not grow with the corpus.
+
+    With `quantization` "int8" (per-dimension scalar codes, 4x smaller) or
+    "binary" (one bit per dimension, 32x smaller, Hamming distance) a
+    compact `codes.npy` is scanned instead, and the best `rescore_factor * k`
+    candidates are re-ranked exactly against their float rows. Only those
+    rows are read from `vectors.npy`, so the memory-resident part of the
+    index is the codes. The mode is recorded in the snapshot, so readers need
+    no configuration.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str,
+        embedding_function=None,
+        dtype: str = "float32",
+        quantization: str = "none",
+        rescore_factor: int = 10,
+    ):
+        if quantization not in MODES:
+            raise ValueError(f"Unknown quantization {quantization!r}; expected one of {', '.join(MODES)}")
+        self.root = Path(persist_directory) / NUMPY_DIR
+        self.embedding_function = embedding_function
+        self.dtype = np.dtype(dtype)
+        self.quantization = quantization
+        self.rescore_factor = max(1, rescore_factor)
+        self._lock = threading.Lock()
+        self._state_stamp = None
+        self._snap = _Snapshot(dtype=self.dtype)
+        # Pending writes: ids removed from the snapshot, and new/replaced rows.
+        self._dead: set = set()
+        self._staging = _Staging(self.root)
+        self._cleared = False
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    @staticmethod
+    def read_state(persist_directory: str) -> Optional[dict]:
+        """The persisted store.json (snapshot, count, dim, dtype, quantization), or None."""
+        state = Path(persist_directory) / NUMPY_DIR / STATE_NAME
+        return json.loads(state.read_text(encoding="utf-8")) if state.exists() else None
+
+
+    def _current(self) -> _Snapshot:
+        """The current snapshot, remapped if store.json changed since the last look."""
+        state = self.root / STATE_NAME
+        try:
+            st = state.stat()
+        except FileNotFoundError:
+            return self._snap
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._state_stamp:
+            return self._snap
+        with self._lock:
+            if stamp != self._state_stamp:
+                meta = json.loads(state.read_text(encoding="utf-8"))
+                path = self.root / meta["snapshot"]
+                quantization = meta.get("quantization", "none") if meta["count"] else "none"
+                has_records = os.path.getsize(path / "records.bin") > 0
+                self._snap = _Snapshot(
+                    meta["snapshot"],
+                    np.load(path / "vectors.npy", mmap_mode="r"),
+                    np.load(path / "sq_norms.npy", mmap_mode="r"),
+                    np.load(path / "offsets.npy", mmap_mode="r"),
+                    np.memmap(path / "records.bin", dtype=np.uint8, mode="r") if has_records else None,
+                    quantization=quantization,
+                    codes=np.load(path / "codes.npy", mmap_mode="r") if quantization != "none" else None,
+                    params=dict(np.load(path / "params.npz")) if quantization != "none" else None,
+                    ids_path=path / IDS_NAME,
+                    id_index=self._load_id_index(path),
+                )
+                self._state_stamp = stamp
+            return self._snap
+
+    @staticmethod
+    def _load_id_index(path: Path):
+        if not (path / ID_HASHES_NAME).exists():
+            return None  # written before the id index existed: built on first lookup
+        size = os.path.getsize(path / IDS_NAME)
+        return (
+            np.load(path / ID_HASHES_NAME, mmap_mode="r"),
+            np.load(path / ID_ROWS_NAME, mmap_mode="r"),
+            np.load(path / ID_OFFSETS_NAME, mmap_mode="r"),
+            np.memmap(path / IDS_NAME, dtype=np.uint8, mode="r") if size else np.zeros(0, dtype=np.uint8),
+        )
+
+    def __len__(self) -> int:
+        return len(self._current())
+
+
+    @staticmethod
+    def _best(scores: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k largest scores, best first."""
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def _top_rows(self, snap: _Snapshot, embedding, k: int, exact: bool = False) -> np.ndarray:
+        n = len(snap)
+        if n == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        q = np.asarray(embedding, dtype=np.float32)
+        if snap.quantization == "none" or exact:
+            return self._best(self._exact_scores(snap.vectors, snap.sq_norms, q), k)
+
+        # Approximate scan over the codes, then exact rescoring of the shortlist.
+        if snap.quantization == "int8":
+            step = snap.params["step"]
+            approx = np.empty(n, dtype=np.float32)
+            for lo in range(0, n, SEARCH_BLOCK):
+                block = snap.codes[lo:lo + SEARCH_BLOCK]
+                approx[lo:lo + len(block)] = int8_dot(block, step, q)
+            approx *= 2
+            approx -= snap.sq_norms
+        else:
+            qbits = to_bits(q, snap.params["thresholds"])
+            approx = np.empty(n, dtype=np.float32)
+            for lo in range(0, n, SEARCH_BLOCK):
+                block = snap.codes[lo:lo + SEARCH_BLOCK]
+                approx[lo:lo + len(block)] = -hamming(block, qbits)
+        shortlist = np.sort(self._best(approx, min(n, k * self.rescore_factor)))
+        exact = self._exact_scores(snap.vectors[shortlist], snap.sq_norms[shortlist], q)
+        return shortlist[self._best(exact, k)]
+
+    @staticmethod
+    def _exact_scores(vectors, sq_norms, q: np.ndarray) -> np.ndarray:
+        # Smallest ||x - q||^2 == largest 2 x.q - ||x||^2 (||q||^2 is constant).
+        n = len(vectors)
+        scores = np.empty(n, dtype=np.float32)
+        for lo in range(0, n, SEARCH_BLOCK):
+            block = vectors[lo:lo + SEARCH_BLOCK]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            np.matmul(block, q, out=scores[lo:lo + len(block)])
+        scores *= 2
+        scores -= sq_norms
+        return scores
+
+    def memory(self) -> dict:
+        """Bytes scanned per query (the part that should stay in RAM) vs a float32 matrix."""
+        snap = self._current()
+        float32 = len(snap) * (snap.vectors.shape[1] if snap.vectors.ndim == 2 else 0) * 4 + snap.sq_norms.nbytes
+        scanned = snap.codes.nbytes if snap.codes is not None else snap.vectors.nbytes
+        return {
+            "quantization": snap.quantization,
+            "rows": len(snap),
+            "float32_bytes": float32,
+            "index_bytes": int(scanned + snap.sq_norms.nbytes),
+            "saved_ratio": round(1 - (scanned + snap.sq_norms.nbytes) / float32, 4) if float32 else 0.0,
+        }
+
+    def recall(self, k: int = 10, samples: int = 32, rows: int = 20000, seed: int = 0) -> float:
+        """
+        Estimated recall@k of the configured search against exact search, with
+        queries synthesized as midpoints of random stored vector pairs. Both
+        searches run over a random subset of at most `rows` rows, so only that
+        many float rows are read however large the store is.
+        """
+        snap = self._current()
+        n = len(snap)
+        if n == 0 or snap.quantization == "none":
+            return 1.0
+        rng = np.random.default_rng(seed)
+        if n > rows:
+            pick = np.sort(rng.choice(n, rows, replace=False))
+            snap = _Snapshot(
+                vectors=np.asarray(snap.vectors[pick]),
+                sq_norms=np.asarray(snap.sq_norms[pick]),
+                quantization=snap.quantization,
+                codes=np.asarray(snap.codes[pick]),
+                params=snap.params,
+            )
+            n = rows
+        pairs = rng.integers(0, n, size=(samples, 2))
+        found = 0
+        for i, j in pairs:
+            q = (np.asarray(snap.vectors[i], dtype=np.float32) + np.asarray(snap.vectors[j], dtype=np.float32)) / 2
+            truth = set(self._top_rows(snap, q, k, exact=True).tolist())
+            found += len(truth & set(self._top_rows(snap, q, k).tolist()))
+        return round(found / (samples * min(k, n)), 4)
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs) -> List[Document]:
+        snap = self._current()
+        return [snap.document(int(r)) for r in self._top_rows(snap, embedding, k)]
+
+    def search_with_embeddings(self, embedding, k: int = 4) -> Tuple[List[Document], np.ndarray]:
+        """Top-k Documents and their stored vectors (as float32), e.g. for MMR."""
+        snap = self._current()
+        rows = self._top_rows(snap, embedding, k)
+        return [snap.document(int(r)) for r in rows], np.asarray(snap.vectors[rows], dtype=np.float32)
+
+    def get_by_ids(self, ids: Sequence[str]) -> List[Document]:
+        snap = self._current()
+        return [snap.document(row) for row in snap.find(list(ids)) if row is not None]
+
+    def get(self, limit: Optional[int] = None, offset: int = 0, include: Iterable[str] = ("documents",)) -> dict:
+        """Chroma-style page of stored chunks (ids, documents, metadatas)."""
+        snap = self._current()
+        end = len(snap) if limit is None else min(len(snap), offset + limit)
+        recs = [snap.record(i) for i in range(offset, end)]
+        return {
+            "ids": [r["id"] for r in recs],
+            "documents": [r["text"] for r in recs],
+            "metadatas": [r["metadata"] for r in recs],
+        }
+
+    def upsert(self, ids: Sequence[str], embeddings, documents: Sequence[str], metadatas: Sequence[dict]) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        self._dead.update(ids)
+        self._staging.append(ids, vectors, documents, metadatas)
+
+    def delete(self, ids: Iterable[str]) -> None:
+        for cid in ids:
+            self._dead.add(cid)
+            self._staging.rows.pop(cid, None)
+
+    def clear(self) -> None:
+        """Drop every stored row (applied, like other writes, by persist())."""
+        self._cleared = True
+        self._dead = set()
+        self._staging.discard()
+
+    def persist(self, force: bool = False) -> None:
+        """
+        Stream surviving and staged rows into a fresh snapshot and switch to it
+        (`force` rewrites an unchanged store, e.g. to change quantization).
+        """
+        staging = self._staging
+        if not self._dead and not staging.rows and not self._cleared and not force:
+            return
+        snap = self._current()
+        keep = np.full(len(snap), not self._cleared)
+        if not self._cleared and self._dead:
+            keep[[row for row in snap.find(list(self._dead)) if row is not None]] = False
+        n_keep = int(keep.sum())
+        new = list(staging.rows.values())
+        dim = snap.vectors.shape[1] if len(snap) else (staging.dim if new else 0)
+        total = n_keep + len(new)
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        name = f"snapshot-{int.from_bytes(os.urandom(6), 'big'):012x}"
+        path = self.root / name
+        path.mkdir()
+        out = np.lib.format.open_memmap(path / "vectors.npy", mode="w+", dtype=self.dtype, shape=(total, dim))
+        sq_norms = np.empty(total, dtype=np.float32)
+        offsets = np.zeros(total + 1, dtype=np.int64)
+
+        kept = np.flatnonzero(keep)
+        self._write_ids(path, snap, kept, list(staging.rows))
+        with open(path / "records.bin", "wb") as f:
+            pos = 0
+            for lo in range(0, n_keep, SEARCH_BLOCK):
+                idx = kept[lo:lo + SEARCH_BLOCK]
+                out[lo:lo + len(idx)] = snap.vectors[idx]
+                for j, row in enumerate(idx, start=lo):
+                    blob = snap.blob(row)
+                    f.write(blob)
+                    pos += len(blob)
+                    offsets[j + 1] = pos
+            if new:
+                staged, staged_offsets, staged_records = staging.open()
+                for lo in range(0, len(new), SEARCH_BLOCK):
+                    idx = new[lo:lo + SEARCH_BLOCK]
+                    out[n_keep + lo:n_keep + lo + len(idx)] = staged[idx]
+                    for j, row in enumerate(idx, start=n_keep + lo):
+                        blob = staged_records[staged_offsets[row]:staged_offsets[row + 1]].tobytes()
+                        f.write(blob)
+                        pos += len(blob)
+                        offsets[j + 1] = pos
+                del staged, staged_records
+        lo_, hi_ = np.full(dim, np.inf, np.float32), np.full(dim, -np.inf, np.float32)
+        total_sum = np.zeros(dim, dtype=np.float64)
+        for lo in range(0, total, SEARCH_BLOCK):
+            block = np.asarray(out[lo:lo + SEARCH_BLOCK], dtype=np.float32)
+            sq_norms[lo:lo + len(block)] = np.einsum("ij,ij->i", block, block)
+            np.minimum(lo_, block.min(axis=0), out=lo_)
+            np.maximum(hi_, block.max(axis=0), out=hi_)
+            total_sum += block.sum(axis=0)
+        out.flush()
+        np.save(path / "sq_norms.npy", sq_norms)
+        np.save(path / "offsets.npy", offsets)
+        if self.quantization != "none" and total:
+            self._write_codes(path, out, lo_, hi_, (total_sum / total).astype(np.float32))
+        del out
+
+        previous = snap.name
+        tmp = self.root / (STATE_NAME + ".tmp")
+        tmp.write_text(json.dumps({
+            "snapshot": name,
+            "count": total,
+            "dim": dim,
+            "dtype": self.dtype.name,
+            "quantization": self.quantization,
+        }))
+        os.replace(tmp, self.root / STATE_NAME)
+        self._dead, self._cleared = set(), False
+        staging.discard()
+        self._current()
+        if previous and previous != name:
+            # Readers that still map the old files keep working (POSIX); on
+            # platforms that refuse, the directory is left behind.
+            shutil.rmtree(self.root / previous, ignore_errors=True)
+
+    @staticmethod
+    def _write_ids(path: Path, snap: _Snapshot, kept: np.ndarray, new_ids: List[str]) -> None:
+        """ids.bin, each id's start in it and the sorted hash index, for kept then new rows."""
+        total = len(kept) + len(new_ids)
+        starts = np.zeros(total + 1, dtype=np.int64)
+        pos = 0
+        with open(path / IDS_NAME, "wb") as f:
+            for j, cid in enumerate(snap.id_bytes(int(r)) for r in kept):
+                f.write(cid if j == 0 else b"\n" + cid)
+                pos += len(cid) + (j > 0)
+                starts[j + 1] = pos + 1
+            for j, cid in enumerate((c.encode("utf-8") for c in new_ids), start=len(kept)):
+                f.write(cid if j == 0 else b"\n" + cid)
+                pos += len(cid) + (j > 0)
+                starts[j + 1] = pos + 1
+        hashes = np.concatenate([snap.row_hashes()[kept], _hash_ids(new_ids)])
+        order = np.argsort(hashes, kind="stable")
+        np.save(path / ID_HASHES_NAME, hashes[order])
+        np.save(path / ID_ROWS_NAME, order.astype(np.int64))
+        np.save(path / ID_OFFSETS_NAME, starts)
+
+    def _write_codes(self, path: Path, vectors, lo: np.ndarray, hi: np.ndarray, mean: np.ndarray) -> None:
+        total, dim = vectors.shape
+        if self.quantization == "int8":
+            offset, step = fit_int8(lo, hi)
+            params = {"offset": offset, "step": step}
+            shape, dtype = (total, dim), np.int8
+        else:
+            # Bits are taken around each dimension's mean, so unbalanced
+            # dimensions still split the corpus roughly in half.
+            params = {"thresholds": mean}
+            shape, dtype = (total, (dim + 7) // 8), np.uint8
+        codes = np.lib.format.open_memmap(path / "codes.npy", mode="w+", dtype=dtype, shape=shape)
+        for start in range(0, total, SEARCH_BLOCK):
+            block = vectors[start:start + SEARCH_BLOCK]
+            if self.quantization == "int8":
+                codes[start:start + len(block)] = to_int8(block, params["offset"], params["step"])
+            else:
+                codes[start:start + len(block)] = to_bits(block, params["thresholds"])
+        codes.flush()
+        del codes
+        np.savez(path / "params.npz", **params)
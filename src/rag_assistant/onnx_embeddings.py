@@ -0,0 +1,201 @@
+# src/rag_assistant/onnx_embeddings.py
+
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EXPORT_META = "export.json"
+# Intra-op thread counts tried by tune_threads, smallest first.
+THREAD_CANDIDATES = (1, 2, 4, 8, 16)
+
+
+def _export_dir(model_name: str, cache_dir: str) -> Path:
+    """One directory per model id (or local path) under cache_dir."""
+    slug = re.sub(r"[^\w.-]+", "--", model_name.strip("/"))[-80:]
+    digest = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:8]
+    return Path(cache_dir) / f"{slug}-{digest}"
+
+
+def export_onnx(model_name: str, cache_dir: str, quantize: bool = True) -> Path:
+    """
+    Export a sentence-transformers model (transformer + its pooling and
+    normalization modules) to ONNX once, plus an int8 dynamically quantized
+    copy, and save the tokenizer beside it. Later calls return the cached
+    directory without importing torch.
+    """
+    out = _export_dir(model_name, cache_dir)
+    meta_path = out / EXPORT_META
+    if meta_path.exists():
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if not quantize or meta.get("quantized_model"):
+            return out
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(model_name, device="cpu")
+    sample = st.tokenizer(["export sample", "a second, longer export sample"], padding=True, return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+
+    class Wrapper(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(dict(zip(input_names, inputs)))["sentence_embedding"]
+
+    out.mkdir(parents=True, exist_ok=True)
+    tmp = out / "model.onnx.tmp"
+    torch.onnx.export(
+        Wrapper(st).eval(),
+        tuple(sample[n] for n in input_names),
+        str(tmp),
+        input_names=input_names,
+        output_names=["sentence_embedding"],
+        dynamic_axes={n: {0: "batch", 1: "sequence"} for n in input_names},
+        opset_version=17,
+        dynamo=False,
+    )
+    os.replace(tmp, out / "model.onnx")
+    st.tokenizer.save_pretrained(str(out))
+
+    dimension = getattr(st, "get_embedding_dimension", None) or st.get_sentence_embedding_dimension
+    meta = {
+        "model_name": model_name,
+        "model": "model.onnx",
+        "inputs": input_names,
+        "max_seq_length": int(st.max_seq_length or st.tokenizer.model_max_length),
+        "dimension": int(dimension()),
+    }
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(out / "model.onnx"), str(out / "model.int8.onnx"), weight_type=QuantType.QInt8)
+        meta["quantized_model"] = "model.int8.onnx"
+    tmp_meta = out / (EXPORT_META + ".tmp")
+    tmp_meta.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp_meta, meta_path)
+    return out
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings with ONNX Runtime on CPU: no PyTorch at inference.
+
+    Texts are tokenized with the fast (Rust) tokenizer, sorted by length so
+    each batch pads as little as possible, and run through the exported graph
+    (int8 weights when `quantize`). `threads=0` measures the fastest
+    intra-op thread count once and remembers it in the export directory.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str,
+        quantize: bool = True,
+        threads: int = 0,
+        batch_size: int = 32,
+    ):
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.dir = export_onnx(model_name, cache_dir, quantize)
+        self.meta = json.loads((self.dir / EXPORT_META).read_text(encoding="utf-8"))
+        self.model_path = self.dir / (self.meta["quantized_model"] if quantize else self.meta["model"])
+
+        self.tokenizer = Tokenizer.from_file(str(self.dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.meta["max_seq_length"])
+        self.tokenizer.no_padding()
+
+        self.threads = threads or self._tuned_threads()
+        self.session = self._session(self.threads)
+
+    def _session(self, threads: int):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return ort.InferenceSession(str(self.model_path), opts, providers=["CPUExecutionProvider"])
+
+    def _tuned_threads(self) -> int:
+        tuned_path = self.dir / f"threads-{self.model_path.stem}.json"
+        cpus = os.cpu_count() or 1
+        if tuned_path.exists():
+            tuned = json.loads(tuned_path.read_text(encoding="utf-8"))
+            if tuned.get("cpus") == cpus:
+                return tuned["threads"]
+        threads = tune_threads(self, [n for n in THREAD_CANDIDATES if n <= cpus] or [1])
+        tuned_path.write_text(json.dumps({"cpus": cpus, "threads": threads}), encoding="utf-8")
+        return threads
+
+    def _run(self, texts: List[str], session=None) -> np.ndarray:
+        session = session or self.session
+        encodings = self.tokenizer.encode_batch(texts)
+        width = max(len(e.ids) for e in encodings)
+        arrays = {name: np.zeros((len(encodings), width), dtype=np.int64) for name in self.meta["inputs"]}
+        for i, e in enumerate(encodings):
+            n = len(e.ids)
+            arrays["input_ids"][i, :n] = e.ids
+            if "attention_mask" in arrays:
+                arrays["attention_mask"][i, :n] = 1
+            if "token_type_ids" in arrays:
+                arrays["token_type_ids"][i, :n] = e.type_ids
+        return session.run(None, arrays)[0]
+
+    def embed_array(self, texts: List[str], session=None) -> np.ndarray:
+        """float32 (len(texts), dim) matrix, computed in length-sorted batches."""
+        if not texts:
+            return np.zeros((0, self.meta["dimension"]), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = np.empty((len(texts), self.meta["dimension"]), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            out[idx] = self._run([texts[i] for i in idx], session)
+        return out
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+
+def tune_threads(embeddings: OnnxEmbeddings, candidates, rounds: int = 3) -> int:
+    """Intra-op thread count with the best measured texts/second for a chunk-sized batch."""
+    texts = [f"{i} " + "lorem ipsum dolor sit amet " * 40 for i in range(embeddings.batch_size)]
+    best, best_rate = candidates[0], 0.0
+    for n in candidates:
+        session = embeddings._session(n)
+        embeddings.embed_array(texts, session)
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            embeddings.embed_array(texts, session)
+        rate = len(texts) * rounds / (time.perf_counter() - t0)
+        if rate > best_rate:
+            best, best_rate = n, rate
+        elif rate < best_rate * 0.9:
+            break
+    return best
+
+
+def onnx_embeddings(model_name: str, cache_dir: str, quantize: bool, threads: int) -> Optional[OnnxEmbeddings]:
+    """OnnxEmbeddings, or None (with a notice) when onnxruntime is not installed."""
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print("[embeddings] EMBEDDING_BACKEND=onnx needs `pip install onnxruntime onnx`; using PyTorch.")
+        return None
+    return OnnxEmbeddings(model_name, cache_dir, quantize=quantize, threads=threads)
@@ -0,0 +1,118 @@
+# src/rag_assistant/packing.py
+
+import math
+import re
+from typing import Callable, List, Optional, Sequence
+
+from langchain_core.documents import Document
+
+CHUNK_SEPARATOR = "\n---\n"
+SENTENCE_SEPARATOR = " "
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+_WORD = re.compile(r"\w{3,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return math.ceil(len(text) / 4)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_END.split(text or "") if s and s.strip()]
+
+
+def _norm(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+class _Sentence:
+    def __init__(self, rank: int, position: int, text: str, source: str):
+        self.rank = rank
+        self.position = position
+        self.text = text
+        self.norm = _norm(text)
+        self.source = source
+        self.score = 0.0
+
+
+def _dedup(sentences: List[_Sentence]) -> List[_Sentence]:
+    """
+    Drop exact duplicates anywhere, and sentences contained in a longer kept
+    sentence of the same source. The splitter's chunk overlap cuts sentences at
+    chunk edges; those fragments are substrings of the full sentence.
+    """
+    kept: List[_Sentence] = []
+    seen = set()
+    for s in sorted(sentences, key=lambda s: (-len(s.norm), s.rank, s.position)):
+        if s.norm in seen:
+            continue
+        if any(s.source == k.source and s.norm in k.norm for k in kept):
+            continue
+        seen.add(s.norm)
+        kept.append(s)
+    return kept
+
+
+def pack_context(
+    docs: Sequence[Document],
+    budget: int,
+    question: str = "",
+    length: Callable[[str], int] = len,
+    scores: Optional[Sequence[float]] = None,
+) -> List[Document]:
+    """
+    Pack the most useful sentences of ranked chunks into `budget`.
+
+    Sentences are deduplicated across chunks, scored by their chunk's
+    relevance (`scores`, or 1/(1+rank) by default) boosted by word overlap with
+    the question, and added greedily by score while they fit. `length` measures
+    cost (characters by default, or e.g. estimate_tokens) and the separators
+    used to join the result are counted. Returns one Document per contributing
+    chunk, with its kept sentences in their original order, in rank order.
+    """
+    sentences = [
+        _Sentence(rank, pos, text, d.metadata.get("source", ""))
+        for rank, d in enumerate(docs)
+        for pos, text in enumerate(split_sentences(d.page_content))
+    ]
+    sentences = _dedup(sentences)
+    if not sentences or budget <= 0:
+        return []
+
+    q_words = set(_WORD.findall(question.casefold()))
+    for s in sentences:
+        base = scores[s.rank] if scores is not None else 1.0 / (1 + s.rank)
+        overlap = len(q_words & set(_WORD.findall(s.norm))) / len(q_words) if q_words else 0.0
+        s.score = base * (1.0 + overlap)
+
+    join_cost, sep_cost = length(SENTENCE_SEPARATOR), length(CHUNK_SEPARATOR)
+    chosen: List[_Sentence] = []
+    chunks = set()
+    used = 0
+    for s in sorted(sentences, key=lambda s: (-s.score, s.rank, s.position)):
+        cost = length(s.text) + (join_cost if s.rank in chunks else (sep_cost if chunks else 0))
+        if used + cost <= budget:
+            chosen.append(s)
+            chunks.add(s.rank)
+            used += cost
+
+    if not chosen:
+        # Even the best sentence is too long: keep as many of its words as fit.
+        best = max(sentences, key=lambda s: (s.score, -s.rank, -s.position))
+        words, text = best.text.split(), ""
+        for w in words:
+            if length(f"{text} {w}".strip()) > budget:
+                break
+            text = f"{text} {w}".strip()
+        best.text = text or best.text[:budget]
+        chosen = [best]
+
+    packed: List[Document] = []
+    for rank in sorted({s.rank for s in chosen}):
+        parts = sorted((s for s in chosen if s.rank == rank), key=lambda s: s.position)
+        packed.append(Document(
+            page_content=SENTENCE_SEPARATOR.join(s.text for s in parts),
+            metadata=dict(docs[rank].metadata),
+        ))
+    return packed
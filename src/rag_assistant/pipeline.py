@@ -0,0 +1,112 @@
+# src/rag_assistant/pipeline.py
+
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+_DONE = object()
+
+
+class _Stopped(Exception):
+    """Raised inside a stage when another stage failed and the pipeline is shutting down."""
+
+
+class StageStats:
+    """Items emitted and busy time (excluding queue waits) for one stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.waited = 0.0
+        self.seconds = 0.0
+
+    def as_dict(self) -> dict:
+        rate = self.items / self.seconds if self.seconds > 0 else 0.0
+        return {"items": self.items, "seconds": round(self.seconds, 3), "per_second": round(rate, 1)}
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                raise _Stopped()
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> None:
+    while True:
+        try:
+            return q.put(item, timeout=0.1)
+        except queue.Full:
+            if stop.is_set():
+                raise _Stopped()
+
+
+# (name, transform, size) where transform maps an input iterator to an output
+# iterator and size(item) is how many units an emitted item counts for.
+Stage = Tuple[str, Callable[[Iterator], Iterable], Callable[[object], int]]
+
+
+def run_pipeline(source: Iterable, stages: List[Stage], maxsize: int = 8) -> dict:
+    """
+    Run `stages` over `source`, each in its own thread, connected by bounded
+    queues of `maxsize` items. A slow stage back-pressures the ones before it,
+    so memory stays flat however large the input is. The first error in any
+    stage stops the pipeline and is re-raised. Returns per-stage throughput.
+    """
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    queues = [queue.Queue(maxsize) for _ in stages]
+    stats = [StageStats(name) for name, _, _ in stages]
+
+    def inputs(i: int) -> Iterator:
+        if i == 0:
+            yield from source
+            return
+        while True:
+            t0 = time.perf_counter()
+            item = _get(queues[i - 1], stop)
+            stats[i].waited += time.perf_counter() - t0
+            if item is _DONE:
+                return
+            yield item
+
+    def work(i: int, transform, size) -> None:
+        st = stats[i]
+        t0 = time.perf_counter()
+        try:
+            for item in transform(inputs(i)):
+                st.items += size(item)
+                t1 = time.perf_counter()
+                _put(queues[i], item, stop)
+                st.waited += time.perf_counter() - t1
+            _put(queues[i], _DONE, stop)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            st.seconds = time.perf_counter() - t0 - st.waited
+
+    threads = [
+        threading.Thread(target=work, args=(i, fn, size), name=f"stage-{name}", daemon=True)
+        for i, (name, fn, size) in enumerate(stages)
+    ]
+    for t in threads:
+        t.start()
+    try:
+        while _get(queues[-1], stop) is not _DONE:
+            pass
+    except _Stopped:
+        pass
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+    if errors:
+        raise errors[0]
+    return {st.name: st.as_dict() for st in stats}
@@ -1,13 +1,17 @@
 # src/rag_assistant/qa.py
 
+import asyncio
 import sys
 import json
 from typing import List, Tuple
 
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-
+from .bm25 import BM25Index
 from .config import settings
+from .embeddings import get_embeddings
+from .llm import build_messages, get_provider
+from .packing import CHUNK_SEPARATOR, estimate_tokens, pack_context
+from .rerank import get_reranker
+from .retriever import embed_question, hybrid_search, mmr_search, open_vectorstore, search
 
 # Ensure Windows consoles can emit UTF-8 (avoids cp1252 UnicodeEncodeError)
 try:
@@ -21,19 +25,51 @@ def _strip_bom(s: str) -> str:
     return s.replace("\ufeff", "") if s else s
 
 
-def run_qa(question: str) -> Tuple[str, List[str]]:
-    """Return (answer_text, sources_list) using extractive fallback over top-k chunks."""
-    embeddings = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
-    vs = Chroma(embedding_function=embeddings, persist_directory=settings.CHROMA_DIR)
-    retriever = vs.as_retriever(search_kwargs={"k": 3})
-
-    docs = retriever.get_relevant_documents(question) or []
+async def _generate_once(provider, question: str, docs) -> str:
+    try:
+        return await provider.generate(build_messages(question, docs))
+    finally:
+        await provider.aclose()
+
+
+def run_qa(question: str, mode: str = settings.RETRIEVAL_MODE, k: int = 3) -> Tuple[str, List[str]]:
+    """
+    Return (answer_text, sources_list). With LLM_PROVIDER set the answer is
+    generated from the top-k chunks; otherwise it is the extractive fallback.
+    `mode="hybrid"` fuses BM25 and vector results, `mode="mmr"` diversifies
+    the MMR_FETCH_K nearest chunks; with RERANK_MODEL set,
+    RERANK_CANDIDATES chunks are fetched and the cross-encoder picks the top k
+    (in mmr mode it only orders the k chunks MMR picked).
+    """
+    embeddings = get_embeddings()
+    vs = open_vectorstore(embeddings, settings.CHROMA_DIR)
+    reranker = get_reranker()
+    fetch = max(k, settings.RERANK_CANDIDATES) if reranker is not None else k
+    if mode == "hybrid":
+        docs = hybrid_search(vs, BM25Index.load(settings.CHROMA_DIR), question, k=fetch) or []
+    elif mode == "mmr":
+        # MMR picks the final k; reranking only reorders them, keeping them diverse.
+        vector = embed_question(vs, question)
+        docs = mmr_search(vs, vector, k, max(settings.MMR_FETCH_K, fetch), settings.MMR_LAMBDA)
+    else:
+        docs = search(vs, question, k=fetch) or []
+    if reranker is not None:
+        # No latency SLO on the CLI, so the pass always runs.
+        docs = reranker.rerank(question, docs, k)
+
+    for d in docs:
+        d.page_content = _strip_bom(d.page_content or "").strip()
+    docs = [d for d in docs if d.page_content]
+    sources = [d.metadata.get("source", "?") for d in docs if d is not None]
 
-    cleaned = [_strip_bom(d.page_content or "").strip() for d in docs]
-    cleaned = [c for c in cleaned if c]
+    provider = get_provider()
+    if provider is not None and docs:
+        context = pack_context(docs, settings.CONTEXT_TOKEN_BUDGET, question, length=estimate_tokens)
+        return asyncio.run(_generate_once(provider, question, context)), sources
 
-    stitched = "\n---\n".join(cleaned)
-    sources = [d.metadata.get("source", "?") for d in docs if d is not None]
+    # No length limit on the CLI: packing here only drops overlapping/duplicate sentences.
+    budget = sum(len(d.page_content) + len(CHUNK_SEPARATOR) for d in docs)
+    stitched = CHUNK_SEPARATOR.join(d.page_content for d in pack_context(docs, budget, question))
 
     if not stitched:
         stitched = (
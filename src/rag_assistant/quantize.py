@@ -0,0 +1,48 @@
+# src/rag_assistant/quantize.py
+
+from typing import Tuple
+
+import numpy as np
+
+MODES = ("none", "int8", "binary")
+
+try:
+    _bitwise_count = np.bitwise_count  # NumPy >= 2.0
+except AttributeError:
+    _POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _bitwise_count(x: np.ndarray) -> np.ndarray:
+        return _POPCOUNT[x]
+
+
+def fit_int8(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-dimension affine int8 code from observed min/max:
+    x ~= offset + (code + 128) * step. Returns (offset, step) as float32.
+    """
+    lo = np.asarray(lo, dtype=np.float32)
+    step = (np.asarray(hi, dtype=np.float32) - lo) / 255.0
+    return lo, np.where(step > 0, step, 1.0).astype(np.float32)
+
+
+def to_int8(block: np.ndarray, offset: np.ndarray, step: np.ndarray) -> np.ndarray:
+    codes = np.rint((np.asarray(block, dtype=np.float32) - offset) / step) - 128
+    return np.clip(codes, -128, 127).astype(np.int8)
+
+
+def int8_dot(codes: np.ndarray, step: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    x.q for the int8 rows up to a constant shared by all rows (offset.q plus
+    128 * step.q), which does not change the ranking.
+    """
+    return codes.astype(np.float32) @ (step * query)
+
+
+def to_bits(block: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    """One bit per dimension (above the dimension's threshold), packed 8 per byte."""
+    return np.packbits(np.asarray(block, dtype=np.float32) > thresholds, axis=-1)
+
+
+def hamming(packed: np.ndarray, query_bits: np.ndarray) -> np.ndarray:
+    """Hamming distance of every packed row to the packed query."""
+    return _bitwise_count(np.bitwise_xor(packed, query_bits)).sum(axis=1, dtype=np.int32)
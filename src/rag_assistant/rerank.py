@@ -0,0 +1,108 @@
+# src/rag_assistant/rerank.py
+
+import hashlib
+import threading
+import time
+from typing import List, Optional, Sequence
+
+from .cache import LRUCache
+from .config import settings
+from .retriever import normalize_question
+
+
+def question_hash(question: str) -> str:
+    """Stable digest of a (normalized) question, used in score-cache keys."""
+    return hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()
+
+
+class Reranker:
+    """
+    Cross-encoder rerank stage over retrieved candidates.
+
+    All uncached (question, chunk) pairs are scored in one batched
+    `model.predict` call; scores are cached per (question hash, chunk id) since
+    chunk ids change whenever chunk text does. The cost of a pass is predicted
+    from the measured seconds per pair (EWMA); if it would not finish before
+    `deadline` (a `time.monotonic()` value) the candidates are returned in
+    retrieval order instead, so reranking never blows the latency budget.
+    """
+
+    def __init__(self, model, batch_size: int = 32, cache_size: int = 10000):
+        self.model = model
+        self.batch_size = batch_size
+        self.scores = LRUCache(cache_size)
+        self.seconds_per_pair = 0.0
+        self.reranked = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def estimate(self, pairs: int) -> float:
+        return pairs * self.seconds_per_pair
+
+    def rerank(self, question: str, docs: Sequence, k: int, deadline: Optional[float] = None) -> List:
+        """Top-k of `docs` by cross-encoder score (or the first k when out of time)."""
+        if not docs:
+            return []
+        qh = question_hash(question)
+        keys = [(qh, d.id or d.page_content) for d in docs]
+        scores = [self.scores.get(key) for key in keys]
+        todo = [i for i, s in enumerate(scores) if s is None]
+
+        if todo:
+            if deadline is not None and time.monotonic() + self.estimate(len(todo)) > deadline:
+                with self._lock:
+                    self.skipped += 1
+                return list(docs[:k])
+            started = time.perf_counter()
+            fresh = self.model.predict(
+                [(question, docs[i].page_content) for i in todo],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            per_pair = (time.perf_counter() - started) / len(todo)
+            with self._lock:
+                self.seconds_per_pair = (
+                    per_pair if not self.seconds_per_pair else 0.8 * self.seconds_per_pair + 0.2 * per_pair
+                )
+            for i, score in zip(todo, fresh):
+                scores[i] = float(score)
+                self.scores.put(keys[i], scores[i])
+
+        with self._lock:
+            self.reranked += 1
+        order = sorted(range(len(docs)), key=lambda i: -scores[i])
+        return [docs[i] for i in order[:k]]
+
+    def stats(self) -> dict:
+        return {
+            "reranked": self.reranked,
+            "skipped_for_deadline": self.skipped,
+            "ms_per_pair": round(self.seconds_per_pair * 1000, 3),
+            "score_cache": self.scores.stats(),
+        }
+
+
+_reranker: Optional[Reranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[Reranker]:
+    """Process-wide reranker for RERANK_MODEL (loaded on first use), or None if unset."""
+    global _reranker
+    if not settings.RERANK_MODEL:
+        return None
+    with _reranker_lock:
+        if _reranker is None:
+            from sentence_transformers import CrossEncoder
+
+            _reranker = Reranker(
+                CrossEncoder(settings.RERANK_MODEL),
+                batch_size=settings.RERANK_BATCH_SIZE,
+                cache_size=settings.RERANK_CACHE_SIZE,
+            )
+        return _reranker
+
+
+def reranker_stats() -> Optional[dict]:
+    """Stats of the loaded reranker without loading it (None until first use)."""
+    return _reranker.stats() if _reranker is not None else None
@@ -0,0 +1,303 @@
+# src/rag_assistant/retriever.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from chromadb.api.shared_system_client import SharedSystemClient
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from .bm25 import BM25Index, rrf_fuse
+from .cache import LRUCache
+from .config import settings
+from .embeddings import CachedEmbeddings, get_embeddings
+from .numpy_store import NumpyStore
+
+WARMUP_QUERIES = (
+    "What is this project?",
+    "How do I run ingestion?",
+    "Which documents are indexed?",
+)
+
+
+def open_vectorstore(embeddings, persist_directory: str, backend: str = None, quantization: str = None):
+    """
+    The VECTOR_BACKEND store ("chroma" or the memory-mapped "numpy" one) at
+    persist_directory. `quantization` only matters when writing a numpy store.
+    """
+    backend = (backend or settings.VECTOR_BACKEND).strip().lower()
+    if backend == "numpy":
+        return NumpyStore(
+            persist_directory,
+            embedding_function=embeddings,
+            dtype=settings.NUMPY_DTYPE,
+            quantization=quantization or settings.NUMPY_QUANTIZATION,
+            rescore_factor=settings.QUANT_RESCORE_FACTOR,
+        )
+    if backend != "chroma":
+        raise ValueError(f"Unknown VECTOR_BACKEND {backend!r}; expected chroma or numpy")
+    return Chroma(embedding_function=embeddings, persist_directory=persist_directory)
+
+
+def build_vectorstore():
+    """Open the persisted store with the configured embedding model."""
+    return open_vectorstore(get_embeddings(), settings.CHROMA_DIR)
+
+
+def reopen_vectorstore(store):
+    """The persisted store opened again, reusing `store`'s already loaded embedding model."""
+    return open_vectorstore(store.embeddings, settings.CHROMA_DIR)
+
+
+def clear_chroma_cache() -> None:
+    """
+    Forget chromadb's per-path System cache. Clients opened afterwards re-read
+    the collection from disk instead of sharing the in-memory vector index of
+    an earlier client, which never sees writes made by another process.
+    """
+    SharedSystemClient.clear_system_cache()
+
+
+# Normalized question -> query embedding, shared by every request in the process.
+query_cache = LRUCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL)
+
+
+def normalize_question(question: str) -> str:
+    """
+    Case- and whitespace-insensitive form of a question. Case folding is
+    lossless for uncased models such as the default all-MiniLM-L6-v2.
+    """
+    return " ".join(question.split()).casefold()
+
+
+def embed_question(store, question: str) -> List[float]:
+    """Query embedding for `question`, served from `query_cache` when possible."""
+    key = normalize_question(question)
+    vector = query_cache.get(key)
+    if vector is None:
+        vector = store.embeddings.embed_query(key)
+        query_cache.put(key, vector)
+    return vector
+
+
+def search(store, question: str, k: int = 4) -> List:
+    """Top-k documents for `question`; only a cache miss pays for the transformer."""
+    return store.similarity_search_by_vector(embed_question(store, question), k=k)
+
+
+def mmr_select(query, candidates, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Maximal marginal relevance: greedily pick indices of `candidates` (n x d)
+    maximizing lambda * sim(query, c) - (1 - lambda) * max sim(c, picked).
+
+    All query and pairwise cosine similarities come from two matrix products;
+    each greedy step is a vectorized update over the candidates, so there is
+    no per-pair Python loop.
+    """
+    X = np.asarray(candidates, dtype=np.float32)
+    if X.ndim != 2 or len(X) == 0 or k <= 0:
+        return []
+    X = X / np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-12)
+    q = np.asarray(query, dtype=np.float32)
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+    relevance = X @ q
+    pairwise = X @ X.T
+
+    picked = [int(np.argmax(relevance))]
+    redundancy = pairwise[picked[0]].copy()
+    available = np.ones(len(X), dtype=bool)
+    available[picked[0]] = False
+    for _ in range(min(k, len(X)) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+    return picked
+
+
+def mmr_search(store, vector, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5) -> List:
+    """Fetch `fetch_k` nearest chunks with their embeddings and keep k diverse ones (MMR)."""
+    if isinstance(store, NumpyStore):
+        docs, embeddings = store.search_with_embeddings(vector, max(k, fetch_k))
+        return [docs[i] for i in mmr_select(vector, embeddings, k, lambda_mult)]
+    got = store._collection.query(
+        query_embeddings=[vector],
+        n_results=max(k, fetch_k),
+        include=["documents", "metadatas", "embeddings"],
+    )
+    ids, embeddings = got["ids"][0], got["embeddings"][0]
+    if not len(ids):
+        return []
+    return [
+        Document(page_content=got["documents"][0][i], metadata=got["metadatas"][0][i] or {}, id=ids[i])
+        for i in mmr_select(vector, embeddings, k, lambda_mult)
+    ]
+
+
+def candidate_count(k: int) -> int:
+    """How many candidates each retriever contributes before fusion/reranking."""
+    return max(4 * k, 20)
+
+
+def fuse(store, dense: Sequence, sparse: Sequence, k: int, weights: Sequence[float] = (1.0, 1.0)) -> List:
+    """
+    Reciprocal-rank-fuse dense results (Documents) with BM25 hits (id, score)
+    and return the top-k Documents; BM25-only hits are fetched from the store.
+    """
+    fused = rrf_fuse([[d.id for d in dense], [cid for cid, _ in sparse]], weights)[:k]
+    by_id = {d.id: d for d in dense}
+    missing = [cid for cid, _ in fused if cid not in by_id]
+    if missing:
+        by_id.update({d.id: d for d in store.get_by_ids(missing)})
+    return [by_id[cid] for cid, _ in fused if cid in by_id]
+
+
+def hybrid_search(store, index: BM25Index, question: str, k: int = 4, weights=(1.0, 1.0)) -> List:
+    """Dense and BM25 searches run concurrently, fused with reciprocal rank fusion."""
+    fetch = candidate_count(k)
+    with ThreadPoolExecutor(2) as pool:
+        dense = pool.submit(search, store, question, fetch)
+        sparse = pool.submit(index.search, question, fetch)
+        return fuse(store, dense.result(), sparse.result(), k, weights)
+
+
+class BM25Holder:
+    """Loads the persisted BM25 index once per index generation."""
+
+    def __init__(self, chroma_dir: str):
+        self.chroma_dir = chroma_dir
+        self._lock = threading.Lock()
+        self._generation = None
+        self._index = None
+
+    def get(self, generation: int) -> BM25Index:
+        with self._lock:
+            if self._index is None or self._generation != generation:
+                self._index = BM25Index.load(self.chroma_dir)
+                self._generation = generation
+            return self._index
+
+
+class RetrieverRegistry:
+    """
+    Process-wide holder for the vector store used by the API.
+
+    The store (and the embedding model inside it) is built once, lazily and
+    under a lock, so concurrent requests never load the model twice. `reload()`
+    swaps in a freshly built store, e.g. after re-ingesting. `get(generation)`
+    reopens the store once per new index generation, keeping the loaded model
+    (through `reopen`, default: build from scratch with `factory`).
+    """
+
+    def __init__(self, factory: Callable = build_vectorstore, reopen: Optional[Callable] = None):
+        self._factory = factory
+        self._reopen = reopen
+        self._lock = threading.Lock()
+        self._reopen_lock = threading.Lock()
+        self._store = None
+        self._generation = None
+        # (warmed, components), replaced as a whole so /readyz never sees it mid-update.
+        self._status: Tuple[bool, Dict[str, dict]] = (False, {})
+
+    @property
+    def loaded(self) -> bool:
+        return self._store is not None
+
+    def stale(self, generation: Optional[int] = None) -> bool:
+        """Whether get(generation) has to open the store first."""
+        if self._store is None:
+            return True
+        return generation is not None and self._generation is not None and generation > self._generation
+
+    def get(self, generation: Optional[int] = None):
+        store = self._store
+        if store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = self._factory()
+                    self._generation = generation
+                store = self._store
+        if generation is None or (self._generation is not None and generation <= self._generation):
+            # Requests that read the generation before a bump use the current store.
+            return self._store
+        with self._reopen_lock:
+            if self._generation is None:
+                # Built before any generation was known (warm-up): adopt this one.
+                self._generation = generation
+            elif generation > self._generation:
+                clear_chroma_cache()
+                fresh = self._reopen(self._store) if self._reopen else self._factory()
+                with self._lock:
+                    self._store, self._generation = fresh, generation
+            return self._store
+
+    def reload(self):
+        # Build outside the lock so in-flight requests keep using the old store.
+        clear_chroma_cache()
+        store = self._factory()
+        with self._lock:
+            self._store = store
+            self._generation = None
+        query_cache.clear()  # the new store may embed with a different model
+        return store
+
+    def status(self) -> Tuple[bool, Dict[str, dict]]:
+        """Readiness and per-component status, read together."""
+        warmed, components = self._status
+        return warmed and all(c["ready"] for c in components.values()), components
+
+    @property
+    def ready(self) -> bool:
+        return self.status()[0]
+
+    @property
+    def components(self) -> Dict[str, dict]:
+        return self._status[1]
+
+    def warmup(self, queries=WARMUP_QUERIES) -> Dict[str, dict]:
+        """
+        Load the model, open the collection, embed a few dummy queries and run
+        one search so the first real request hits a hot process. Per-component
+        readiness and timings are published for /readyz after each step, as a
+        new dict that is never modified afterwards.
+        """
+        components: Dict[str, dict] = {}
+        self._status = (False, {})
+
+        def step(name, fn):
+            t0 = time.perf_counter()
+            try:
+                fn()
+                result = {"ready": True}
+            except Exception as e:
+                result = {"ready": False, "error": str(e)}
+            result["seconds"] = round(time.perf_counter() - t0, 4)
+            components[name] = result
+            self._status = (False, dict(components))
+            return result["ready"]
+
+        # Model load and collection open both happen when the store is built.
+        if not step("retriever", self.get):
+            return self.components
+        store = self._store
+        # Bypass the disk cache: hits there would skip the model's forward pass.
+        emb = store.embeddings
+        model = emb.base if isinstance(emb, CachedEmbeddings) else emb
+        step("query_embedding", lambda: [model.embed_query(q) for q in queries])
+        # By vector: the numpy store has no text-query search.
+        step("search", lambda: store.similarity_search_by_vector(store.embeddings.embed_query(queries[0]), k=1))
+        self._status = (True, dict(components))
+        return self.components
+
+    def clear(self) -> None:
+        with self._lock:
+            self._store = None
+            self._generation = None
+
+
+registry = RetrieverRegistry(build_vectorstore, reopen_vectorstore)
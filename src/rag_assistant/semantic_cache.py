@@ -0,0 +1,129 @@
+# src/rag_assistant/semantic_cache.py
+
+import threading
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+# Histogram of best-match cosine similarity per lookup, 0.05 wide bins over [0, 1].
+_BINS = 20
+
+
+class SemanticCache:
+    """
+    Near-duplicate question cache over query embeddings.
+
+    Vectors of recently answered questions live in one preallocated float32
+    matrix, so a lookup is a single matrix-vector product. A lookup hits when
+    the closest entry with the same scope (e.g. k, max_chars and index
+    generation) is within `max_distance` cosine distance. When full, the
+    least recently used slot is overwritten. Thread-safe.
+    """
+
+    def __init__(self, capacity: int, max_distance: float = 0.05):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._scope_ids = np.full(max(capacity, 0), -1, dtype=np.int64)
+        self._used = np.zeros(max(capacity, 0), dtype=np.int64)
+        self._values: List[Any] = [None] * max(capacity, 0)
+        self._scopes: Dict[Hashable, int] = {}
+        self._next_scope = 0
+        self._size = 0
+        self._tick = 0
+        self._histogram = np.zeros(_BINS, dtype=np.int64)
+        self._similarity_sum = 0.0
+        self._lookups = 0
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def get(self, vector, scope: Hashable) -> Any:
+        if self.capacity <= 0:
+            return None
+        q = self._unit(vector)
+        with self._lock:
+            sid = self._scopes.get(scope)
+            if sid is None or self._vectors is None or self._vectors.shape[1] != q.shape[0]:
+                self.misses += 1
+                return None
+            n = self._size
+            sims = self._vectors[:n] @ q
+            sims[self._scope_ids[:n] != sid] = -np.inf
+            best = int(np.argmax(sims))
+            sim = float(sims[best])
+            if sim == -np.inf:
+                self.misses += 1
+                return None
+            self._record(sim)
+            if 1.0 - sim > self.max_distance:
+                self.misses += 1
+                return None
+            self._tick += 1
+            self._used[best] = self._tick
+            self.hits += 1
+            return self._values[best]
+
+    def put(self, vector, scope: Hashable, value: Any) -> None:
+        if self.capacity <= 0:
+            return
+        q = self._unit(vector)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != q.shape[0]:
+                self._vectors = np.zeros((self.capacity, q.shape[0]), dtype=np.float32)
+                self._size = 0
+                self._scopes.clear()
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._used))
+            if scope not in self._scopes:
+                self._drop_dead_scopes()
+                self._scopes[scope] = self._next_scope
+                self._next_scope += 1
+            self._tick += 1
+            self._vectors[slot] = q
+            self._scope_ids[slot] = self._scopes[scope]
+            self._used[slot] = self._tick
+            self._values[slot] = value
+
+    def _drop_dead_scopes(self) -> None:
+        # Forget scopes (e.g. old index generations) that no longer own any slot.
+        live = set(self._scope_ids[:self._size].tolist())
+        for scope, sid in list(self._scopes.items()):
+            if sid not in live:
+                del self._scopes[scope]
+
+    def _record(self, similarity: float) -> None:
+        self._lookups += 1
+        self._similarity_sum += similarity
+        self._histogram[min(_BINS - 1, max(0, int(similarity * _BINS)))] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._size = 0
+            self._scopes.clear()
+            self._values = [None] * max(self.capacity, 0)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": self._size,
+            "capacity": self.capacity,
+            "max_distance": self.max_distance,
+            "mean_best_similarity": round(self._similarity_sum / self._lookups, 4) if self._lookups else None,
+            # Lower bin edge -> number of lookups whose best match fell in [edge, edge + 0.05).
+            "similarity_histogram": {
+                f"{i / _BINS:.2f}": int(c) for i, c in enumerate(self._histogram) if c
+            },
+        }
@@ -0,0 +1,212 @@
+# src/rag_assistant/splitter.py
+
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+SEPARATORS = ("\n\n", "\n", " ", "")
+
+
+class OffsetTextSplitter:
+    """
+    Recursive separator splitting (same boundaries as LangChain's
+    RecursiveCharacterTextSplitter with its defaults) computed on offsets.
+
+    Pieces are (start, end) positions into the original text and the greedy
+    merge jumps between them with binary searches over prefix lengths, so no
+    intermediate strings are built or re-joined; each chunk is sliced once.
+    Chunk documents carry `start_index`/`end_index` offsets in their metadata.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, separators: Sequence[str] = SEPARATORS):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators)
+
+    @staticmethod
+    def _lengths(positions: List[int], units: Optional[List[int]]) -> List[int]:
+        """Cumulative length at each position: characters, or tokens starting before it."""
+        if units is None:
+            return positions
+        return [bisect_left(units, p) for p in positions]
+
+    @staticmethod
+    def _pieces(text: str, start: int, end: int, separator: str, units: Optional[List[int]]) -> List[int]:
+        """Boundaries of the pieces of text[start:end], each starting with its separator."""
+        if not separator:
+            if units is None:
+                return list(range(start, end + 1))
+            # Finest level in token mode: cut between tokens, not characters.
+            inner = units[bisect_right(units, start):bisect_left(units, end)]
+            return [start] + sorted(set(inner)) + [end]
+        bounds = [start]
+        step = len(separator)
+        at = text.find(separator, start, end)
+        while at != -1:
+            if at > bounds[-1]:
+                bounds.append(at)
+            at = text.find(separator, at + step, end)
+        if end > bounds[-1]:
+            bounds.append(end)
+        return bounds
+
+    @staticmethod
+    def _emit(text: str, start: int, end: int, out: List[Tuple[int, int]]) -> None:
+        # Whitespace-stripped span; empty ones are dropped.
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            out.append((start, end))
+
+    def _merge(self, text: str, b: List[int], c: List[int], lo: int, hi: int, out: List[Tuple[int, int]]) -> None:
+        """
+        Greedily merge pieces lo..hi-1 (boundaries b, cumulative lengths c) into
+        chunks of at most chunk_size, each starting with up to chunk_overlap of
+        the previous one.
+        """
+        size, overlap = self.chunk_size, self.chunk_overlap
+        cs = lo
+        while True:
+            # First piece that no longer fits after the chunk starting at cs.
+            t = bisect_right(c, c[cs] + size, cs, hi + 1) - 1
+            if t >= hi:
+                break
+            self._emit(text, b[cs], b[t], out)
+            # Drop leading pieces until at most `overlap` is kept and piece t fits.
+            cs = bisect_left(c, max(c[t] - overlap, c[t + 1] - size), cs, t + 1)
+        self._emit(text, b[cs], b[hi], out)
+
+    def _split(
+        self,
+        text: str,
+        start: int,
+        end: int,
+        separators: Tuple[str, ...],
+        units: Optional[List[int]],
+        out: List[Tuple[int, int]],
+    ) -> None:
+        separator, rest = separators[-1], ()
+        for i, sep in enumerate(separators):
+            if not sep:
+                separator = sep
+                break
+            if text.find(sep, start, end) != -1:
+                separator, rest = sep, separators[i + 1:]
+                break
+        b = self._pieces(text, start, end, separator, units)
+        c = self._lengths(b, units)
+        good = 0  # first piece of the current run of pieces shorter than chunk_size
+        for t in range(len(b) - 1):
+            if c[t + 1] - c[t] < self.chunk_size:
+                continue
+            if good < t:
+                self._merge(text, b, c, good, t, out)
+            if rest:
+                self._split(text, b[t], b[t + 1], rest, units, out)
+            else:
+                out.append((b[t], b[t + 1]))
+            good = t + 1
+        if good < len(b) - 1:
+            self._merge(text, b, c, good, len(b) - 1, out)
+
+    def _spans(self, text: str, units: Optional[List[int]] = None) -> List[Tuple[int, int]]:
+        out: List[Tuple[int, int]] = []
+        if text:
+            self._split(text, 0, len(text), self.separators, units, out)
+        return out
+
+    def split_spans(self, text: str) -> List[Tuple[int, int]]:
+        """(start, end) offsets of the chunks of text, in order."""
+        return self._spans(text)
+
+    def split_spans_batch(self, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        return [self._spans(t) for t in texts]
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[s:e] for s, e in self.split_spans(text)]
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        documents = list(documents)
+        chunks = []
+        for doc, spans in zip(documents, self.split_spans_batch([d.page_content for d in documents])):
+            for s, e in spans:
+                metadata = {**doc.metadata, "start_index": s, "end_index": e}
+                chunks.append(Document(page_content=doc.page_content[s:e], metadata=metadata))
+        return chunks
+
+
+def boundary_drift(expected: List[str], text: str, spans: List[Tuple[int, int]]) -> Optional[int]:
+    """
+    Largest start/end offset difference between spans and the `expected` chunks,
+    each located at its occurrence in text nearest the span (None when the
+    chunk counts differ).
+    """
+    if len(expected) != len(spans):
+        return None
+    drift = 0
+    for chunk, (s, e) in zip(expected, spans):
+        if text[s:e] == chunk:
+            continue
+        found = [at for at in (text.rfind(chunk, 0, s + len(chunk)), text.find(chunk, s)) if at != -1]
+        at = min(found, key=lambda a: abs(a - s), default=s)
+        drift = max(drift, abs(at - s), abs(at + len(chunk) - e))
+    return drift
+
+
+class TokenTextSplitter(OffsetTextSplitter):
+    """
+    The same recursive splitting, measured in the embedding model's tokens:
+    every chunk, special tokens included, fits `max_tokens`, so nothing is
+    truncated away at embedding time.
+
+    Documents are tokenized once, in one batched call to the fast (Rust)
+    tokenizer; a span's length is the number of document tokens starting in
+    it. Only chunks cut inside a word (words longer than a whole chunk) can
+    tokenize differently on their own, so only those are re-measured and,
+    if they overflow, split again.
+    """
+
+    def __init__(self, tokenizer, max_tokens: int, chunk_overlap: int = 50, separators: Sequence[str] = SEPARATORS):
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_str(tokenizer.to_str())
+        self.tokenizer.no_truncation()
+        self.tokenizer.no_padding()
+        self.max_tokens = max_tokens
+        specials = len(self.tokenizer.encode("", add_special_tokens=True).ids)
+        super().__init__(max_tokens - specials, chunk_overlap, separators)
+
+    @staticmethod
+    def _mid_word(units: List[int], words: List[Optional[int]], pos: int) -> bool:
+        j = bisect_left(units, pos)
+        return 0 < j < len(units) and words[j] is not None and words[j] == words[j - 1]
+
+    def split_spans(self, text: str) -> List[Tuple[int, int]]:
+        return self.split_spans_batch([text])[0]
+
+    def split_spans_batch(self, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        out, suspects = [], []
+        for i, (text, enc) in enumerate(zip(texts, self.tokenizer.encode_batch(texts, add_special_tokens=False))):
+            units = [s for s, _ in enc.offsets]
+            spans = self._spans(text, units)
+            for j, (s, e) in enumerate(spans):
+                if self._mid_word(units, enc.word_ids, s) or self._mid_word(units, enc.word_ids, e):
+                    suspects.append((i, j))
+            out.append(spans)
+        if not suspects:
+            return out
+        pieces = [texts[i][slice(*out[i][j])] for i, j in suspects]
+        refits = {}
+        for (i, j), piece, enc in zip(suspects, pieces, self.tokenizer.encode_batch(pieces)):
+            if len(enc.ids) > self.max_tokens:
+                s = out[i][j][0]
+                refits[i, j] = [(s + a, s + b) for a, b in self.split_spans(piece)]
+        return [
+            [part for j, span in enumerate(spans) for part in refits.get((i, j), [span])]
+            for i, spans in enumerate(out)
+        ]
@@ -0,0 +1,23 @@
+import pytest
+
+
+@pytest.fixture(scope="session")
+def tiny_model(tmp_path_factory):
+    """A small random sentence-transformers model built offline (no hub access)."""
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    root = tmp_path_factory.mktemp("tiny")
+    words = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    words += "the a is of to and in what how do i run ingestion alpha beta error code reset".split()
+    (root / "vocab.txt").write_text("\n".join(words), encoding="utf-8")
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=len(words), hidden_size=32, num_hidden_layers=2,
+                        num_attention_heads=2, intermediate_size=64, max_position_embeddings=128)
+    BertModel(config).save_pretrained(root / "bert")
+    BertTokenizerFast(str(root / "vocab.txt")).save_pretrained(root / "bert")
+    transformer = models.Transformer(str(root / "bert"), max_seq_length=64)
+    st = SentenceTransformer(modules=[transformer, models.Pooling(32, "mean"), models.Normalize()])
+    st.save(str(root / "st"))
+    return str(root / "st")
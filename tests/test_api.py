@@ -6,3 +6,308 @@ def test_healthz_ok():
     r = c.get("/healthz")
     assert r.status_code == 200
     assert r.json() == {"status": "ok"}
+
+def test_readyz_reports_warmup(monkeypatch):
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from rag_assistant import api
+    from rag_assistant.retriever import RetrieverRegistry
+
+    reg = RetrieverRegistry(
+        lambda: Chroma(collection_name="readyz", embedding_function=DeterministicFakeEmbedding(size=8))
+    )
+    monkeypatch.setattr(api, "registry", reg)
+    c = TestClient(app)
+    assert c.get("/readyz").status_code == 503
+
+    reg.warmup()
+    r = c.get("/readyz")
+    assert r.status_code == 200
+    assert set(r.json()["components"]) == {"retriever", "query_embedding", "search"}
+
+def test_readyz_with_numpy_backend(monkeypatch, tmp_path):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from rag_assistant import api
+    from rag_assistant.numpy_store import NumpyStore
+    from rag_assistant.retriever import RetrieverRegistry
+
+    emb = DeterministicFakeEmbedding(size=8)
+    store = NumpyStore(str(tmp_path), emb)
+    store.upsert(["a"], [emb.embed_query("alpha")], ["alpha"], [{"source": "doc0.md"}])
+    store.persist()
+    reg = RetrieverRegistry(lambda: NumpyStore(str(tmp_path), emb))
+    monkeypatch.setattr(api, "registry", reg)
+    reg.warmup()
+    r = TestClient(app).get("/readyz")
+    assert r.status_code == 200, r.json()
+    assert all(c["ready"] for c in r.json()["components"].values())
+
+def _fake_registry(name, texts):
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from rag_assistant.retriever import RetrieverRegistry
+
+    store = Chroma(collection_name=name, embedding_function=DeterministicFakeEmbedding(size=8))
+    store.add_texts(texts, metadatas=[{"source": f"doc{i}.md"} for i in range(len(texts))])
+    return RetrieverRegistry(lambda: store)
+
+def test_ask_reuses_query_embedding(monkeypatch):
+    from rag_assistant import api
+    from rag_assistant.cache import LRUCache
+    from rag_assistant.retriever import query_cache
+
+    monkeypatch.setattr(api, "registry", _fake_registry("ask-cache", ["alpha", "beta"]))
+    monkeypatch.setattr(api, "answer_cache", LRUCache(0))
+    query_cache.clear()
+    c = TestClient(app)
+    first = c.post("/ask", json={"question": "What is alpha?", "k": 2})
+    second = c.post("/ask", json={"question": "  what IS alpha? ", "k": 2})
+    assert first.status_code == 200
+    assert first.json() == second.json()
+    assert c.get("/stats").json()["query_cache"]["hits"] >= 1
+
+def test_answer_cache_follows_index_generation(monkeypatch, tmp_path):
+    from rag_assistant import api
+    from rag_assistant.cache import LRUCache
+    from rag_assistant.manifest import IndexGeneration, bump_generation
+
+    reg = _fake_registry("answer-cache", ["gamma"])
+    monkeypatch.setattr(api, "registry", reg)
+    monkeypatch.setattr(api, "index_generation", IndexGeneration(str(tmp_path)))
+    monkeypatch.setattr(api, "answer_cache", LRUCache(16))
+    c = TestClient(app)
+
+    c.post("/ask", json={"question": "gamma?"})
+    c.post("/ask", json={"question": "Gamma?"})
+    assert api.answer_cache.stats()["hits"] == 1
+
+    bump_generation(str(tmp_path))
+    c.post("/ask", json={"question": "gamma?"})
+    assert api.answer_cache.stats()["hits"] == 1
+    assert c.get("/stats").json()["index_generation"] == 1
+
+def test_ask_sees_documents_ingested_by_another_process(monkeypatch, tmp_path):
+    import subprocess, sys
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from rag_assistant import api
+    from rag_assistant.cache import LRUCache
+    from rag_assistant.manifest import IndexGeneration
+    from rag_assistant.retriever import RetrieverRegistry
+
+    data_dir, storage_dir = tmp_path / "data", str(tmp_path / "storage")
+    data_dir.mkdir()
+    ingest = (
+        "from langchain_core.embeddings import DeterministicFakeEmbedding\n"
+        "from rag_assistant.ingest import ingest_dir\n"
+        f"ingest_dir({str(data_dir)!r}, {storage_dir!r}, DeterministicFakeEmbedding(size=8), backend='chroma')\n"
+    )
+    (data_dir / "alpha.md").write_text("alpha", encoding="utf-8")
+    subprocess.check_call([sys.executable, "-c", ingest])
+
+    emb = DeterministicFakeEmbedding(size=8)
+    reg = RetrieverRegistry(
+        lambda: Chroma(embedding_function=emb, persist_directory=storage_dir),
+        lambda store: Chroma(embedding_function=store.embeddings, persist_directory=storage_dir),
+    )
+    monkeypatch.setattr(api, "registry", reg)
+    monkeypatch.setattr(api, "index_generation", IndexGeneration(storage_dir))
+    monkeypatch.setattr(api, "answer_cache", LRUCache(16))
+    c = TestClient(app)
+    assert c.post("/ask", json={"question": "beta", "k": 2}).json()["sources"] == [str(data_dir / "alpha.md")]
+    store = reg.get()
+
+    (data_dir / "beta.md").write_text("beta", encoding="utf-8")
+    subprocess.check_call([sys.executable, "-c", ingest])
+    sources = c.post("/ask", json={"question": "beta", "k": 2}).json()["sources"]
+    assert str(data_dir / "beta.md") in sources
+    assert reg.get() is not store and reg.get().embeddings is emb
+
+def test_ask_rejects_when_saturated(monkeypatch):
+    from rag_assistant import api
+    from rag_assistant.concurrency import AdmissionControl
+
+    monkeypatch.setattr(api, "admission", AdmissionControl(0))
+    r = TestClient(app).post("/ask", json={"question": "anything"})
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "1"
+
+def test_ask_batch_in_order_and_streamed(monkeypatch):
+    import json
+    from rag_assistant import api
+    from rag_assistant.cache import LRUCache
+
+    monkeypatch.setattr(api, "registry", _fake_registry("ask-batch", ["one", "two", "three"]))
+    monkeypatch.setattr(api, "answer_cache", LRUCache(0))
+    c = TestClient(app)
+    items = [{"question": "one?"}, {"question": "two?", "k": -1}, {"question": "three?", "k": 1}]
+
+    r = c.post("/ask/batch", json={"items": items})
+    results = r.json()["results"]
+    assert [x["index"] for x in results] == [0, 1, 2]
+    assert results[0]["answer"] and results[1]["error"] and len(results[2]["sources"]) == 1
+
+    r = c.post("/ask/batch", json={"items": items, "stream": True})
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert sorted(x["index"] for x in lines) == [0, 1, 2]
+
+def test_streams_release_slot_when_client_disconnects_early(monkeypatch):
+    import asyncio
+    import pytest
+    from rag_assistant import api
+    from rag_assistant.concurrency import AdmissionControl
+
+    monkeypatch.setattr(api, "registry", _fake_registry("ask-gone", ["alpha"]))
+    monkeypatch.setattr(api, "admission", AdmissionControl(2))
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client went away")  # fails on the response start
+
+    async def run():
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+        for _ in range(2):
+            for resp in (
+                await api.ask_stream(api.AskRequest(question="alpha?")),
+                await api.ask_batch(api.AskBatchRequest(items=[{"question": "alpha?"}], stream=True)),
+            ):
+                with pytest.raises(Exception):
+                    await resp(scope, receive, send)
+
+    asyncio.run(run())
+    assert api.admission.stats()["inflight"] == 0
+    assert TestClient(app).post("/ask", json={"question": "alpha?"}).status_code == 200
+
+def test_ask_stream_sends_sources_first(monkeypatch):
+    import json
+    from rag_assistant import api
+    from rag_assistant.cache import LRUCache
+
+    from rag_assistant.semantic_cache import SemanticCache
+
+    monkeypatch.setattr(api, "registry", _fake_registry("ask-stream", ["first chunk", "second chunk"]))
+    monkeypatch.setattr(api, "answer_cache", LRUCache(0))
+    monkeypatch.setattr(api, "semantic_cache", SemanticCache(0))
+    c = TestClient(app)
+    plain = c.post("/ask", json={"question": "chunks?", "k": 2}).json()
+
+    r = c.post("/ask/stream", json={"question": "chunks?", "k": 2})
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+        for block in r.text.strip().split("\n\n")
+    ]
+    assert events[0] == ("sources", plain["sources"])
+    assert "".join(d for e, d in events if e == "answer") == plain["answer"]
+    assert events[-1][0] == "done"
+
+def test_ask_stream_caches_semantic_hits(monkeypatch):
+    from rag_assistant import api
+    from rag_assistant.cache import LRUCache
+    from rag_assistant.semantic_cache import SemanticCache
+
+    monkeypatch.setattr(api, "registry", _fake_registry("stream-semantic", ["first chunk"]))
+    monkeypatch.setattr(api, "answer_cache", LRUCache(16))
+    monkeypatch.setattr(api, "semantic_cache", SemanticCache(16, max_distance=2.0))  # any question is similar
+    c = TestClient(app)
+    c.post("/ask/stream", json={"question": "chunks?"})
+    c.post("/ask/stream", json={"question": "a paraphrase"})  # semantic hit
+    assert api.semantic_cache.stats()["hits"] == 1
+    c.post("/ask/stream", json={"question": "a paraphrase"})
+    assert api.answer_cache.stats()["hits"] == 1
+    assert api.semantic_cache.stats()["hits"] == 1
+
+def test_ask_uses_llm_provider(monkeypatch):
+    from rag_assistant import api
+    from rag_assistant.cache import LRUCache
+    from tests.test_llm import stub_provider
+
+    monkeypatch.setattr(api, "registry", _fake_registry("ask-llm", ["context chunk"]))
+    monkeypatch.setattr(api, "answer_cache", LRUCache(0))
+    monkeypatch.setattr(api, "llm", stub_provider())
+    r = TestClient(app).post("/ask", json={"question": "Generated?", "k": 1})
+    assert r.json()["answer"] == "Stub answer to: Generated? [doc0.md]"
+
+def test_ask_hybrid_finds_exact_identifier(monkeypatch, tmp_path):
+    import threading
+    from rag_assistant import api
+    from rag_assistant.bm25 import BM25Index
+    from rag_assistant.cache import LRUCache
+    from rag_assistant.retriever import BM25Holder
+
+    texts = [f"filler note {i}" for i in range(10)] + ["Restart fixes ERR_CONN_RESET."]
+    reg = _fake_registry("hybrid", texts)
+    store = reg.get()
+    data = store.get()
+    index = BM25Index()
+    index.upsert(data["ids"], data["documents"])
+    index.save(str(tmp_path))
+    monkeypatch.setattr(api, "registry", reg)
+    loaded_on = []
+
+    class RecordingHolder(BM25Holder):
+        def get(self, generation):
+            loaded_on.append(threading.current_thread().name)
+            return super().get(generation)
+
+    monkeypatch.setattr(api, "bm25", RecordingHolder(str(tmp_path)))
+    monkeypatch.setattr(api, "answer_cache", LRUCache(0))
+    monkeypatch.setattr(api, "semantic_cache", api.SemanticCache(0, 0.05))
+    c = TestClient(app)
+    r = c.post("/ask", json={"question": "ERR_CONN_RESET", "k": 1, "mode": "hybrid", "vector_weight": 0.0})
+    assert r.status_code == 200
+    assert r.json()["sources"] == ["doc10.md"]
+    assert loaded_on and all(name.startswith("search") for name in loaded_on)  # never on the event loop
+
+def test_ask_reranks_candidates(monkeypatch):
+    from dataclasses import replace
+    from rag_assistant import api
+    from rag_assistant.cache import LRUCache
+    from rag_assistant.rerank import Reranker
+
+    class ByLength:
+        def predict(self, pairs, batch_size=32, show_progress_bar=False):
+            return [len(text) for _, text in pairs]
+
+    texts = ["a", "bb", "cccccccccc", "ddd"]
+    monkeypatch.setattr(api, "registry", _fake_registry("rerank", texts))
+    monkeypatch.setattr(api, "settings", replace(api.settings, RERANK_MODEL="fake", RERANK_DEADLINE_MS=60000))
+    monkeypatch.setattr(api, "get_reranker", lambda: Reranker(ByLength()))
+    monkeypatch.setattr(api, "answer_cache", LRUCache(0))
+    monkeypatch.setattr(api, "semantic_cache", api.SemanticCache(0, 0.05))
+    c = TestClient(app)
+    r = c.post("/ask", json={"question": "longest?", "k": 1})
+    assert r.json()["sources"] == ["doc2.md"]
+
+def test_ask_mmr_drops_duplicate_chunks(monkeypatch):
+    from rag_assistant import api
+    from rag_assistant.cache import LRUCache
+
+    monkeypatch.setattr(api, "registry", _fake_registry("mmr", ["same text", "same text", "other text"]))
+    monkeypatch.setattr(api, "answer_cache", LRUCache(0))
+    c = TestClient(app)
+    r = c.post("/ask", json={"question": "same text", "k": 2, "mode": "mmr", "fetch_k": 3, "lambda": 0.3})
+    assert r.status_code == 200
+    assert len(r.json()["sources"]) == 2
+
+def test_ask_mmr_with_rerank_keeps_chunks_diverse(monkeypatch):
+    from dataclasses import replace
+    from rag_assistant import api
+    from rag_assistant.cache import LRUCache
+    from rag_assistant.rerank import Reranker
+
+    class PrefersDuplicates:
+        def predict(self, pairs, batch_size=32, show_progress_bar=False):
+            return [float(text == "same text") for _, text in pairs]
+
+    texts = ["same text"] * 5 + ["other text"]
+    monkeypatch.setattr(api, "registry", _fake_registry("mmr-rerank", texts))
+    monkeypatch.setattr(api, "settings", replace(api.settings, RERANK_MODEL="fake", RERANK_DEADLINE_MS=60000))
+    monkeypatch.setattr(api, "get_reranker", lambda: Reranker(PrefersDuplicates()))
+    monkeypatch.setattr(api, "answer_cache", LRUCache(0))
+    monkeypatch.setattr(api, "semantic_cache", api.SemanticCache(0, 0.05))
+    r = TestClient(app).post("/ask", json={"question": "same text", "k": 2, "mode": "mmr", "lambda": 0.3})
+    assert r.status_code == 200
+    assert r.json()["sources"] == ["doc0.md", "doc5.md"]
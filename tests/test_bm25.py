@@ -0,0 +1,26 @@
+from rag_assistant.bm25 import BM25Index, rrf_fuse, tokenize
+
+def test_tokenize_keeps_identifiers_whole():
+    tokens = tokenize("Got ERR_CONN_RESET (0x80070005) in v1.2.3")
+    assert "err_conn_reset" in tokens and "conn" in tokens
+    assert "0x80070005" in tokens
+    assert "v1.2.3" in tokens
+
+def test_bm25_upsert_remove_and_persist(tmp_path):
+    index = BM25Index()
+    index.upsert(["a", "b", "c"], ["disk full error E42", "network timeout", "printer jam"])
+    assert index.search("E42", k=2)[0][0] == "a"
+
+    index.upsert(["a"], ["all good now"])  # replace, not duplicate
+    index.remove(["c"])
+    assert index.search("E42") == []
+    assert len(index) == 2
+
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    assert [cid for cid, _ in loaded.search("network")] == ["b"]
+
+def test_rrf_fuse_weights():
+    fused = rrf_fuse([["x", "y"], ["y", "z"]], [1.0, 1.0])
+    assert fused[0][0] == "y"
+    assert [cid for cid, _ in rrf_fuse([["x"], ["z"]], [0.0, 1.0])] == ["z"]
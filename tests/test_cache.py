@@ -0,0 +1,35 @@
+import time
+from rag_assistant.cache import LRUCache
+
+def test_lru_evicts_and_expires():
+    c = LRUCache(capacity=2, ttl=0.05)
+    c.put("a", 1)
+    c.put("b", 2)
+    assert c.get("a") == 1
+    c.put("c", 3)  # evicts "b", the least recently used
+    assert c.get("b") is None
+    assert c.get("c") == 3
+    time.sleep(0.06)
+    assert c.get("a") is None
+    assert c.stats()["hits"] == 2
+
+
+def test_micro_batcher_coalesces_concurrent_calls():
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from rag_assistant.concurrency import MicroBatcher
+
+    calls = []
+
+    def double(items):
+        calls.append(len(items))
+        return [i * 2 for i in items]
+
+    batcher = MicroBatcher(double, ThreadPoolExecutor(1), max_batch=4, max_wait=0.01)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(6)))
+
+    assert asyncio.run(main()) == [0, 2, 4, 6, 8, 10]
+    assert calls == [4, 2]
+    assert batcher.stats()["max_batch_size"] == 4
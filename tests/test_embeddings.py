@@ -0,0 +1,53 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from rag_assistant.embeddings import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_cached_embeddings_hits_and_evicts(tmp_path):
+    base = CountingEmbedding(size=8)
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite"), max_entries=3)
+    emb = CachedEmbeddings(base, cache, "fake")
+
+    first = emb.embed_documents(["alpha", "beta", "alpha"])
+    assert base.calls == 2
+    assert emb.embed_documents(["alpha ", "beta"]) == first[:2]
+    assert base.calls == 2
+    assert cache.stats()["hits"] == 2
+
+    emb.embed_documents(["gamma", "delta"])
+    assert cache.stats()["entries"] == 3
+
+    # Survives a new process/connection on the same file.
+    reopened = CachedEmbeddings(base, EmbeddingCache(str(tmp_path / "emb.sqlite")), "fake")
+    reopened.embed_documents(["delta"])
+    assert base.calls == 4
+
+
+def test_autotune_picks_a_candidate():
+    from rag_assistant.embeddings import autotune_batch_size
+
+    assert autotune_batch_size(DeterministicFakeEmbedding(size=8), "sample text", candidates=(2, 4, 8)) in (2, 4, 8)
+
+
+def test_embedding_pool_matches_in_process_vectors(tiny_model):
+    import numpy as np
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from rag_assistant.embed_pool import EmbeddingPool
+
+    texts = ["what is alpha", "héllo beta", "error code reset " * 20, "run", "the ingestion"]
+    expected = np.array(HuggingFaceEmbeddings(model_name=tiny_model).embed_documents(texts))
+    pool = EmbeddingPool(tiny_model, processes=2, threads=1, batch_size=2)
+    try:
+        assert pool.cache_name == tiny_model
+        assert np.allclose(pool.embed_documents(texts), expected, atol=1e-5)
+        assert np.allclose(pool.embed_query(texts[1]), expected[1], atol=1e-5)
+        assert pool.embed_documents([]) == []
+    finally:
+        pool.close()
@@ -20,3 +20,204 @@ def test_ingest_creates_storage(tmp_path, monkeypatch):
     assert storage_dir.exists(), "Chroma storage dir not created"
     assert any(storage_dir.iterdir()), "Expected Chroma persistence files"
 
+
+
+def test_ingest_is_incremental(tmp_path):
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from rag_assistant.ingest import ingest_dir
+
+    data_dir, storage_dir = tmp_path / "data", tmp_path / "storage"
+    data_dir.mkdir()
+    (data_dir / "a.md").write_text("Alpha document. " * 100, encoding="utf-8")
+    (data_dir / "b.txt").write_text("Beta document.", encoding="utf-8")
+    emb = DeterministicFakeEmbedding(size=8)
+
+    def count():
+        return Chroma(embedding_function=emb, persist_directory=str(storage_dir))._collection.count()
+
+    first = ingest_dir(str(data_dir), str(storage_dir), emb)
+    assert first["added"] == 2 and first["generation"] == 1
+    n = count()
+
+    again = ingest_dir(str(data_dir), str(storage_dir), emb)
+    assert again["unchanged"] == 2 and again["chunks"] == 0
+    assert "generation" not in again
+    assert count() == n
+
+    (data_dir / "a.md").write_text("Alpha, shorter now.", encoding="utf-8")
+    (data_dir / "b.txt").unlink()
+    third = ingest_dir(str(data_dir), str(storage_dir), emb)
+    assert third["updated"] == 1 and third["removed"] == 1
+    assert third["generation"] == 2
+    assert count() == 1
+
+
+def test_parallel_loading_isolates_failures(tmp_path):
+    from rag_assistant.ingest import _iter_loaded
+
+    good = tmp_path / "good.md"
+    good.write_text("Loaded in a worker.", encoding="utf-8")
+    bad = tmp_path / "bad.pdf"
+    bad.write_bytes(b"not a pdf")
+
+    results = {p.name: (docs, err) for p, docs, err in _iter_loaded([good, bad], workers=2)}
+    assert results["good.md"][0][0].page_content == "Loaded in a worker."
+    assert results["bad.pdf"][1]
+
+def test_ingest_numpy_backend(tmp_path):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from rag_assistant.ingest import ingest_dir
+    from rag_assistant.numpy_store import NumpyStore
+
+    data_dir, storage_dir = tmp_path / "data", tmp_path / "storage"
+    data_dir.mkdir()
+    (data_dir / "a.md").write_text("Alpha document. " * 100, encoding="utf-8")
+    (data_dir / "b.txt").write_text("Beta document.", encoding="utf-8")
+    emb = DeterministicFakeEmbedding(size=8)
+
+    # An existing Chroma index is re-embedded into the numpy store on switch.
+    ingest_dir(str(data_dir), str(storage_dir), emb, backend="chroma")
+    first = ingest_dir(str(data_dir), str(storage_dir), emb, backend="numpy")
+    assert first["added"] + first["updated"] == 2
+    store = NumpyStore(str(storage_dir), emb)
+    n = len(store)
+    assert n > 2
+
+    (data_dir / "b.txt").unlink()
+    ingest_dir(str(data_dir), str(storage_dir), emb, backend="numpy")
+    assert len(store) == n - 1
+    hit = store.similarity_search_by_vector(emb.embed_query("Beta document."), k=1)[0]
+    assert hit.metadata["source"].endswith("a.md")
+
+def test_ingest_switches_quantization_without_reembedding(tmp_path):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from rag_assistant.ingest import ingest_dir
+    from rag_assistant.numpy_store import NumpyStore
+
+    data_dir, storage_dir = tmp_path / "data", tmp_path / "storage"
+    data_dir.mkdir()
+    (data_dir / "a.md").write_text("Alpha document. " * 100, encoding="utf-8")
+    emb = DeterministicFakeEmbedding(size=16)
+
+    ingest_dir(str(data_dir), str(storage_dir), emb, backend="numpy")
+    stats = ingest_dir(str(data_dir), str(storage_dir), emb, backend="numpy", quantization="int8")
+    assert stats["chunks"] == 0 and stats["generation"] == 2
+    assert stats["vector_index"]["quantization"] == "int8"
+    assert NumpyStore.read_state(str(storage_dir))["quantization"] == "int8"
+
+def test_ingest_token_chunks_fit_the_model(tmp_path, tiny_model):
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from rag_assistant.ingest import ingest_dir
+    from rag_assistant.numpy_store import NumpyStore
+
+    data_dir, storage_dir = tmp_path / "data", tmp_path / "storage"
+    data_dir.mkdir()
+    (data_dir / "a.md").write_text("what is alpha. how do i run the ingestion? " * 60, encoding="utf-8")
+    emb = HuggingFaceEmbeddings(model_name=tiny_model)
+    tokenizer, max_tokens = emb._client.tokenizer, emb._client.max_seq_length
+
+    chars = ingest_dir(str(data_dir), str(storage_dir), emb, backend="numpy", chunk_unit="chars")
+    tokens = ingest_dir(str(data_dir), str(storage_dir), emb, backend="numpy", chunk_unit="tokens")
+    # Switching the chunk unit re-splits unchanged files.
+    assert tokens["updated"] == 1 and tokens["chunks"] > chars["chunks"]
+    texts = NumpyStore(str(storage_dir), emb).get()["documents"]
+    assert len(texts) == tokens["chunks"]
+    assert max(len(tokenizer(t)["input_ids"]) for t in texts) <= max_tokens
+    assert ingest_dir(str(data_dir), str(storage_dir), emb, backend="numpy", chunk_unit="tokens")["chunks"] == 0
+
+def test_ingest_switching_back_to_chroma_rebuilds_it(tmp_path):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from rag_assistant.ingest import ingest_dir
+    from rag_assistant.retriever import open_vectorstore
+
+    data_dir, storage_dir = tmp_path / "data", tmp_path / "storage"
+    data_dir.mkdir()
+    (data_dir / "a.md").write_text("Alpha document.", encoding="utf-8")
+    (data_dir / "b.md").write_text("Beta document.", encoding="utf-8")
+    emb = DeterministicFakeEmbedding(size=8)
+
+    ingest_dir(str(data_dir), str(storage_dir), emb, backend="chroma")
+    ingest_dir(str(data_dir), str(storage_dir), emb, backend="numpy")
+    (data_dir / "b.md").unlink()
+    (data_dir / "c.md").write_text("Gamma document.", encoding="utf-8")
+    ingest_dir(str(data_dir), str(storage_dir), emb, backend="numpy")
+
+    stats = ingest_dir(str(data_dir), str(storage_dir), emb, backend="chroma")
+    assert stats["unchanged"] == 0
+    sources = {m["source"].rsplit("/", 1)[-1] for m in open_vectorstore(emb, str(storage_dir), "chroma").get()["metadatas"]}
+    assert sources == {"a.md", "c.md"}
+
+def test_ingest_closes_embedding_pool_when_a_stage_fails(tmp_path, monkeypatch):
+    import pytest
+    from rag_assistant import ingest
+    from rag_assistant.embed_pool import EmbeddingPool
+
+    class FailingPool(EmbeddingPool):
+        def __init__(self):
+            self.processes, self.batch_size, self.closed = 2, 8, False
+
+        def embed_documents(self, texts):
+            raise RuntimeError("worker died")
+
+        def close(self):
+            self.closed = True
+
+    pool = FailingPool()
+    monkeypatch.setattr(ingest, "get_embeddings", lambda processes=1: pool)
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "a.md").write_text("Alpha document.", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        ingest.ingest_dir(str(data_dir), str(tmp_path / "storage"), backend="numpy", chunk_unit="chars")
+    assert pool.closed
+
+def test_numpy_ingest_stages_batches_on_disk(tmp_path, monkeypatch):
+    from dataclasses import replace
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from rag_assistant import ingest
+    from rag_assistant.numpy_store import NumpyStore
+
+    monkeypatch.setattr(ingest, "settings", replace(ingest.settings, UPSERT_BATCH_SIZE=16))
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for i in range(6):
+        (data_dir / f"d{i}.md").write_text(f"Document {i} sentence. " * 400, encoding="utf-8")
+    held, upsert = [], NumpyStore.upsert
+
+    def spy(self, ids, embeddings, documents, metadatas):
+        upsert(self, ids, embeddings, documents, metadatas)
+        staging = self._staging
+        on_disk = (staging.path / "vectors.bin").stat().st_size // (staging.dim * 4)
+        held.append((len(ids), staging.count - on_disk))
+
+    monkeypatch.setattr(NumpyStore, "upsert", spy)
+    stats = ingest.ingest_dir(str(data_dir), str(tmp_path / "storage"), DeterministicFakeEmbedding(size=8), backend="numpy")
+    assert len(held) > 3 and max(n for n, _ in held) <= 16
+    assert max(in_memory for _, in_memory in held) <= 16
+    assert sum(n for n, _ in held) == stats["chunks"] == len(NumpyStore(str(tmp_path / "storage")))
+    assert not list((tmp_path / "storage" / "numpy").glob("staging-*"))
+
+def test_ingest_replaces_a_store_built_without_a_manifest(tmp_path):
+    from langchain_chroma import Chroma
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from rag_assistant.ingest import ingest_dir
+
+    data_dir, storage_dir = tmp_path / "data", str(tmp_path / "storage")
+    data_dir.mkdir()
+    (data_dir / "a.md").write_text("Alpha document.", encoding="utf-8")
+    emb = DeterministicFakeEmbedding(size=8)
+    # The pre-manifest ingest: add_documents with random ids.
+    Chroma(embedding_function=emb, persist_directory=storage_dir).add_documents(
+        [Document(page_content="Alpha document.", metadata={"source": str(data_dir / "a.md")})]
+    )
+
+    def count():
+        return Chroma(embedding_function=emb, persist_directory=storage_dir)._collection.count()
+
+    ingest_dir(str(data_dir), storage_dir, emb, backend="chroma")
+    assert count() == 1
+    (data_dir / "b.md").write_text("Beta document.", encoding="utf-8")
+    ingest_dir(str(data_dir), storage_dir, emb, backend="chroma")
+    assert count() == 2
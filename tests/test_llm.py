@@ -0,0 +1,105 @@
+import asyncio
+import httpx
+from langchain_core.documents import Document
+from rag_assistant.llm import OpenAICompatibleProvider, build_messages
+from rag_assistant.llm_stub import app as stub_app
+
+DOCS = [Document(page_content="Ready Tensor teaches RAG.", metadata={"source": "data/dummy.md"})]
+
+def stub_provider(transport=None, **kw):
+    transport = transport or httpx.ASGITransport(app=stub_app)
+    return OpenAICompatibleProvider("http://stub/v1", "", "stub", transport=transport, **kw)
+
+def test_generate_and_stream_against_stub():
+    async def main():
+        p = stub_provider()
+        msgs = build_messages("What is this?", DOCS)
+        full = await p.generate(msgs)
+        streamed = "".join([d async for d in p.stream(msgs)])
+        await p.aclose()
+        return full, streamed
+
+    full, streamed = asyncio.run(main())
+    assert full == "Stub answer to: What is this? [data/dummy.md]"
+    assert streamed == full
+
+def test_generate_retries_transient_errors():
+    calls = []
+    inner = httpx.ASGITransport(app=stub_app)
+
+    class Flaky(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            calls.append(1)
+            if len(calls) == 1:
+                return httpx.Response(503, headers={"retry-after": "0"})
+            return await inner.handle_async_request(request)
+
+    async def main():
+        p = stub_provider(Flaky(), max_retries=1)
+        try:
+            return await p.generate(build_messages("Q?", DOCS))
+        finally:
+            await p.aclose()
+
+    assert asyncio.run(main()).startswith("Stub answer to: Q?")
+    assert len(calls) == 2
+
+def test_stream_does_not_replay_after_mid_stream_failure():
+    import pytest
+    from rag_assistant.llm import LLMError
+
+    calls = []
+
+    class Broken(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield b'data: {"choices": [{"delta": {"content": "Hello "}}]}\n\n'
+            raise httpx.ReadError("connection reset")
+
+    class MidStreamFailure(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            calls.append(1)
+            return httpx.Response(200, stream=Broken())
+
+    async def main():
+        p = stub_provider(MidStreamFailure(), max_retries=2)
+        got = []
+        try:
+            with pytest.raises(LLMError):
+                async for delta in p.stream(build_messages("Q?", DOCS)):
+                    got.append(delta)
+        finally:
+            await p.aclose()
+        return got
+
+    assert asyncio.run(main()) == ["Hello "]
+    assert len(calls) == 1
+
+def test_malformed_responses_raise_llm_error():
+    import pytest
+    from rag_assistant.llm import LLMError
+
+    bodies = [b"not json", b'{"choices": []}', b'{"choices": [{"text": "legacy"}]}']
+
+    class Malformed(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            return httpx.Response(200, content=bodies.pop(0))
+
+    async def main():
+        p = stub_provider(Malformed())
+        try:
+            for _ in range(3):
+                with pytest.raises(LLMError):
+                    await p.generate(build_messages("Q?", DOCS))
+        finally:
+            await p.aclose()
+
+    asyncio.run(main())
+    assert bodies == []
+
+def test_client_of_a_previous_event_loop_is_closed():
+    p = stub_provider()
+    asyncio.run(p.generate(build_messages("Q?", DOCS)))
+    first = p._client
+    asyncio.run(p.generate(build_messages("Q?", DOCS)))
+    assert first.is_closed and p._client is not first
+    asyncio.run(p.aclose())
@@ -0,0 +1,71 @@
+import numpy as np
+from rag_assistant.numpy_store import NumpyStore
+
+def _vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+def test_numpy_store_exact_top_k_matches_brute_force(tmp_path):
+    X = _vectors(50)
+    store = NumpyStore(str(tmp_path))
+    ids = [f"c{i}" for i in range(50)]
+    store.upsert(ids, X, [f"text {i}" for i in range(50)], [{"source": f"d{i % 5}.md"} for i in range(50)])
+    store.persist()
+
+    q = _vectors(1, seed=1)[0]
+    expected = [f"c{i}" for i in np.argsort(((X - q) ** 2).sum(axis=1))[:5]]
+    reader = NumpyStore(str(tmp_path))
+    hits = reader.similarity_search_by_vector(q, k=5)
+    assert [d.id for d in hits] == expected
+    assert hits[0].page_content == f"text {expected[0][1:]}"
+    assert isinstance(reader._current().vectors, np.memmap)
+
+def test_numpy_store_updates_are_seen_by_open_readers(tmp_path):
+    writer = NumpyStore(str(tmp_path), dtype="float16")
+    writer.upsert(["a", "b"], _vectors(2), ["alpha", "beta"], [{}, {}])
+    writer.persist()
+    reader = NumpyStore(str(tmp_path))
+    assert len(reader) == 2
+
+    writer.delete(["a"])
+    writer.upsert(["b", "c"], _vectors(2, seed=3), ["beta v2", "gamma"], [{}, {"source": "c.md"}])
+    writer.persist()
+    assert len(reader) == 2
+    assert reader._current().vectors.dtype == np.float16
+    assert {d.page_content for d in reader.get_by_ids(["a", "b", "c"])} == {"beta v2", "gamma"}
+
+def test_id_lookups_do_not_decode_every_record(tmp_path, monkeypatch):
+    from rag_assistant.numpy_store import _Snapshot
+
+    writer = NumpyStore(str(tmp_path))
+    writer.upsert([f"c{i}" for i in range(20)], _vectors(20), [f"t{i}" for i in range(20)], [{}] * 20)
+    writer.persist()
+    decoded = []
+    record = _Snapshot.record
+    monkeypatch.setattr(_Snapshot, "record", lambda self, row: decoded.append(row) or record(self, row))
+
+    writer.delete(["c3"])
+    writer.upsert(["c20"], _vectors(1, seed=2), ["t20"], [{}])
+    writer.persist()
+    assert decoded == []
+    reader = NumpyStore(str(tmp_path))
+    assert [d.page_content for d in reader.get_by_ids(["c5", "c3", "c20"])] == ["t5", "t20"]
+    assert len(decoded) == 2
+    # Looked up in the mapped hash index: no per-process id list or dict.
+    snap = reader._current()
+    assert snap._ids is None and all(isinstance(a, np.memmap) for a in snap.id_index)
+    assert snap.find(["c20", "c0", "missing"]) == [19, 0, None]
+
+def test_quantized_modes_rescore_exactly(tmp_path):
+    X = _vectors(400, dim=32)
+    q = X[7] + 0.01
+    for mode in ("int8", "binary"):
+        store = NumpyStore(str(tmp_path / mode), quantization=mode, rescore_factor=20)
+        store.upsert([f"c{i}" for i in range(400)], X, ["t"] * 400, [{}] * 400)
+        store.persist()
+        reader = NumpyStore(str(tmp_path / mode))  # mode comes from the snapshot
+        assert reader.similarity_search_by_vector(q, k=1)[0].id == "c7"
+        mem = reader.memory()
+        assert mem["quantization"] == mode and mem["index_bytes"] < mem["float32_bytes"]
+        assert 0.0 <= reader.recall(k=5, samples=8) <= 1.0
+        assert 0.0 <= reader.recall(k=5, samples=8, rows=100) <= 1.0
+    assert NumpyStore(str(tmp_path / "binary")).memory()["saved_ratio"] > 0.9
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+TEXTS = ["what is alpha", "how do i run the ingestion", "error code reset " * 30, "beta"]
+
+
+def test_onnx_matches_pytorch_vectors(tiny_model, tmp_path):
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from rag_assistant.onnx_embeddings import OnnxEmbeddings
+
+    expected = np.array(HuggingFaceEmbeddings(model_name=tiny_model).embed_documents(TEXTS))
+    exact = OnnxEmbeddings(tiny_model, str(tmp_path), quantize=False, threads=1, batch_size=3)
+    got = np.array(exact.embed_documents(TEXTS))
+    assert np.allclose(got, expected, atol=1e-4)
+    assert np.allclose(exact.embed_query(TEXTS[0]), expected[0], atol=1e-4)
+
+    quantized = OnnxEmbeddings(tiny_model, str(tmp_path), quantize=True, threads=0)
+    cosine = (np.array(quantized.embed_documents(TEXTS)) * expected).sum(axis=1)
+    assert cosine.min() > 0.95
+    assert quantized.threads >= 1
+
+
+def test_onnx_export_is_cached(tiny_model, tmp_path):
+    from rag_assistant.onnx_embeddings import export_onnx
+
+    first = export_onnx(tiny_model, str(tmp_path))
+    stamp = (first / "model.int8.onnx").stat().st_mtime_ns
+    assert export_onnx(tiny_model, str(tmp_path)) == first
+    assert (first / "model.int8.onnx").stat().st_mtime_ns == stamp
@@ -0,0 +1,16 @@
+from langchain_core.documents import Document
+from rag_assistant.packing import CHUNK_SEPARATOR, pack_context
+
+def test_pack_dedups_overlap_and_respects_budget():
+    a = Document(page_content="Alpha is first. Beta explains the error code E42. Gamma sta", metadata={"source": "a.md"})
+    b = Document(page_content="Gamma starts the overlap. Delta ends it.", metadata={"source": "a.md"})
+    dup = Document(page_content="Alpha is first.", metadata={"source": "b.md"})
+
+    packed = pack_context([a, b, dup], budget=1000, question="What is E42?")
+    text = CHUNK_SEPARATOR.join(d.page_content for d in packed)
+    assert text.count("Alpha is first.") == 1
+    assert "Gamma sta" + CHUNK_SEPARATOR not in text and "Gamma starts the overlap." in text
+
+    tight = pack_context([a, b], budget=40, question="What is E42?")
+    text = CHUNK_SEPARATOR.join(d.page_content for d in tight)
+    assert text == "Beta explains the error code E42."
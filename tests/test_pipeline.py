@@ -0,0 +1,28 @@
+import pytest
+from rag_assistant.pipeline import run_pipeline
+
+def test_pipeline_streams_and_reports_stats():
+    out = []
+
+    def double(items):
+        for x in items:
+            yield x * 2
+
+    def collect(items):
+        for x in items:
+            out.append(x)
+            yield x
+
+    stats = run_pipeline(range(100), [("double", double, lambda x: 1), ("collect", collect, lambda x: 1)], maxsize=2)
+    assert out == [x * 2 for x in range(100)]
+    assert stats["double"]["items"] == 100
+
+def test_pipeline_propagates_stage_errors():
+    def boom(items):
+        for x in items:
+            if x == 5:
+                raise ValueError("bad item")
+            yield x
+
+    with pytest.raises(ValueError):
+        run_pipeline(range(1000), [("boom", boom, lambda x: 1), ("pass", lambda it: it, lambda x: 1)], maxsize=1)
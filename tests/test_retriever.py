@@ -0,0 +1,125 @@
+import threading, time
+from rag_assistant.retriever import RetrieverRegistry
+
+def test_registry_builds_once_and_reloads():
+    calls = []
+
+    def factory():
+        time.sleep(0.01)
+        calls.append(1)
+        return object()
+
+    reg = RetrieverRegistry(factory)
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(reg.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len({id(s) for s in seen}) == 1
+
+    fresh = reg.reload()
+    assert len(calls) == 2
+    assert reg.get() is fresh
+
+def test_registry_reopens_once_per_generation():
+    reopened = []
+
+    def reopen(store):
+        time.sleep(0.01)
+        reopened.append(store)
+        return object()
+
+    reg = RetrieverRegistry(object, reopen)
+    first = reg.get()
+    assert reg.get(3) is first and not reg.stale(3)  # warm-up store adopts the generation
+    assert reg.stale(4)
+    threads = [threading.Thread(target=reg.get, args=(4,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert reopened == [first]
+    current = reg.get(4)
+    assert current is not first and reg.get() is current
+    # A request that read the generation before the bump keeps the new store.
+    assert not reg.stale(3) and reg.get(3) is current and reopened == [first]
+
+def test_reranker_batches_caches_and_respects_deadline():
+    import time
+    from langchain_core.documents import Document
+    from rag_assistant.rerank import Reranker
+
+    class FakeCrossEncoder:
+        def __init__(self):
+            self.calls = []
+
+        def predict(self, pairs, batch_size=32, show_progress_bar=False):
+            self.calls.append(len(pairs))
+            return [text.count("reset") for _, text in pairs]
+
+    docs = [Document(page_content=t, id=str(i)) for i, t in enumerate(["intro", "reset reset", "reset"])]
+    model = FakeCrossEncoder()
+    rr = Reranker(model)
+    assert [d.id for d in rr.rerank("How to reset?", docs, k=2)] == ["1", "2"]
+    assert [d.id for d in rr.rerank("how to  RESET?", docs, k=2)] == ["1", "2"]
+    assert model.calls == [3]  # one batched pass, then served from the score cache
+
+    rr.seconds_per_pair = 1.0
+    other = rr.rerank("new question", docs, k=2, deadline=time.monotonic() + 0.5)
+    assert [d.id for d in other] == ["0", "1"]  # out of time: retrieval order
+    assert rr.stats()["skipped_for_deadline"] == 1
+
+def test_mmr_select_skips_near_duplicates():
+    import numpy as np
+    from rag_assistant.retriever import mmr_select
+
+    cands = np.array([[1.0, 0.0], [0.99, 0.01], [0.6, 0.8]])
+    query = [1.0, 0.0]
+    assert mmr_select(query, cands, k=2, lambda_mult=1.0) == [0, 1]  # pure relevance = top-k
+    assert mmr_select(query, cands, k=2, lambda_mult=0.3) == [0, 2]
+    assert sorted(mmr_select(query, cands, k=5)) == [0, 1, 2]
+
+def test_warmup_runs_the_model_despite_the_disk_cache(tmp_path):
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from rag_assistant.embeddings import CachedEmbeddings, EmbeddingCache
+    from rag_assistant.retriever import WARMUP_QUERIES
+
+    class Counting(DeterministicFakeEmbedding):
+        calls: int = 0
+
+        def embed_query(self, text):
+            self.calls += 1
+            return super().embed_query(text)
+
+    base = Counting(size=8)
+    emb = CachedEmbeddings(base, EmbeddingCache(str(tmp_path / "emb.sqlite")), "fake")
+    reg = RetrieverRegistry(lambda: Chroma(collection_name="warm-cache", embedding_function=emb))
+    reg.warmup()
+    first = base.calls
+    reg.warmup()  # every query is now in the disk cache
+    assert base.calls - first == len(WARMUP_QUERIES)
+    assert reg.ready
+
+def test_warmup_publishes_status_without_mutating_it():
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from rag_assistant.retriever import RetrieverRegistry
+
+    seen = []
+
+    class Probing(DeterministicFakeEmbedding):
+        def embed_query(self, text):
+            seen.append(reg.status())  # what a concurrent /readyz would read
+            return super().embed_query(text)
+
+    reg = RetrieverRegistry(lambda: Chroma(collection_name="warm-status", embedding_function=Probing(size=8)))
+    reg.warmup()
+    ready, components = seen[0]
+    assert not ready and list(components) == ["retriever"]
+    assert set(components["retriever"]) == {"ready", "seconds"}
+    assert all(c is not reg.components for _, c in seen)
+    assert reg.status() == (True, reg.components) and len(reg.components) == 3
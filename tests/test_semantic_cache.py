@@ -0,0 +1,20 @@
+import numpy as np
+from rag_assistant.semantic_cache import SemanticCache
+
+def test_semantic_cache_matches_paraphrases_within_scope():
+    c = SemanticCache(capacity=2, max_distance=0.05)
+    q = np.array([1.0, 0.0, 0.0])
+    c.put(q, ("k4", 1), "answer")
+
+    assert c.get(np.array([1.0, 0.1, 0.0]), ("k4", 1)) == "answer"
+    assert c.get(np.array([0.0, 1.0, 0.0]), ("k4", 1)) is None
+    assert c.get(q, ("k4", 2)) is None  # different generation
+
+    c.put(np.array([0.0, 1.0, 0.0]), ("k4", 1), "b")
+    c.get(q, ("k4", 1))  # touch the first entry so "b" is least recently used
+    c.put(np.array([0.0, 0.0, 1.0]), ("k4", 1), "c")
+    assert c.get(np.array([0.0, 1.0, 0.0]), ("k4", 1)) is None
+    assert c.get(q, ("k4", 1)) == "answer"
+
+    stats = c.stats()
+    assert stats["hits"] == 3 and stats["similarity_histogram"]
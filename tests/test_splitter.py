@@ -0,0 +1,51 @@
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from rag_assistant.splitter import OffsetTextSplitter
+
+TEXT = (
+    "# Title\n\nFirst paragraph about ingestion and retrieval. " * 6
+    + "\n\nhttps://example.com/" + "x" * 240 + "\n"
+    + "short line\n  \n\n\n"
+    + " ".join(f"word{i}" for i in range(120))
+)
+
+
+def test_offset_splitter_matches_recursive_character_splitter():
+    for size, overlap in ((1000, 200), (100, 20), (50, 0), (40, 39)):
+        expected = RecursiveCharacterTextSplitter(chunk_size=size, chunk_overlap=overlap).split_text(TEXT)
+        assert OffsetTextSplitter(size, overlap).split_text(TEXT) == expected
+    assert OffsetTextSplitter(100, 20).split_text("") == []
+
+
+def test_offset_splitter_records_offsets():
+    doc = Document(page_content=TEXT, metadata={"source": "a.md"})
+    chunks = OffsetTextSplitter(100, 20).split_documents([doc])
+    assert len(chunks) > 3
+    for chunk in chunks:
+        start, end = chunk.metadata["start_index"], chunk.metadata["end_index"]
+        assert TEXT[start:end] == chunk.page_content
+        assert chunk.metadata["source"] == "a.md"
+    starts = [c.metadata["start_index"] for c in chunks]
+    assert starts == sorted(starts)
+
+
+def test_token_splitter_chunks_fit_max_tokens():
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from rag_assistant.splitter import TokenTextSplitter
+
+    vocab = {"[UNK]": 0, "[CLS]": 1, "[SEP]": 2, "word": 3, "##s": 4, "a": 5, "##a": 6, ".": 7}
+    tokenizer = Tokenizer(models.WordPiece(vocab, unk_token="[UNK]", max_input_chars_per_word=500))
+    tokenizer.normalizer = normalizers.BertNormalizer()
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 1), ("[SEP]", 2)]
+    )
+    text = "Words word.\n\n" * 30 + "a" * 100 + " words\nword " * 20
+    splitter = TokenTextSplitter(tokenizer, 16, 4)
+    spans = splitter.split_spans(text)
+    assert splitter.chunk_size == 14
+    assert max(len(tokenizer.encode(text[s:e]).ids) for s, e in spans) == 16
+    covered = set()
+    for s, e in spans:
+        covered.update(range(s, e))
+    assert all(i in covered for i, ch in enumerate(text) if not ch.isspace())